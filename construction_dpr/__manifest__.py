@@ -29,6 +29,7 @@ A comprehensive Daily Progress Report module for construction industry with:
         'mail',
         'hr',
         'project',
+        'state_transition_log',
     ],
     'data': [
         'security/dpr_security.xml',
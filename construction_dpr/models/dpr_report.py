@@ -7,7 +7,7 @@ from odoo.exceptions import ValidationError
 class DprReport(models.Model):
     _name = 'dpr.report'
     _description = 'Daily Progress Report'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'state.transition.mixin']
     _order = 'report_date desc, name desc'
 
     name = fields.Char(
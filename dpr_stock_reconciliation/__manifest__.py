@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+{
+    'name': 'DPR Stock Reconciliation',
+    'version': '19.0.1.0.0',
+    'category': 'Construction/Project Management',
+    'summary': 'Reconcile DPR site stock consumption against issued material',
+    'description': """
+DPR Stock Reconciliation
+========================
+
+Matches the site stock consumption reported in daily progress reports with
+the stock moves issued by material requests.
+
+- Daily consumed and issued quantities per project and product, joined by
+  one grouped SQL statement
+- Daily and cumulative variances flagged beyond a tolerance
+- Nightly incremental run over the days not reconciled yet, plus an on
+  demand run over any date range
+    """,
+    'author': 'Nilamber',
+    'company': 'Nilamber',
+    'website': 'https://www.nilamber.com',
+    'depends': [
+        'construction_dpr',
+        'material_consumption',
+    ],
+    'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
+        'views/dpr_stock_reconciliation_views.xml',
+    ],
+    'installable': True,
+    'application': False,
+    'license': 'LGPL-3',
+}
@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+
+from . import dpr_stock_reconciliation
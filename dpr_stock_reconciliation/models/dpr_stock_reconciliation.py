@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+LAST_DATE_PARAM = 'dpr_stock_reconciliation.last_date'
+# Start of the last cron run; DPRs and moves written since are reconciled again
+LAST_RUN_PARAM = 'dpr_stock_reconciliation.last_run'
+TOLERANCE_PARAM = 'dpr_stock_reconciliation.tolerance_percent'
+DEFAULT_TOLERANCE_PERCENT = 5.0
+# First incremental run reconciles this many days back
+INITIAL_LOOKBACK_DAYS = 90
+
+
+class DprStockReconciliation(models.Model):
+    _name = 'dpr.stock.reconciliation'
+    _description = 'DPR Stock Reconciliation'
+    _order = 'date desc, project_id, product_id'
+    _log_access = False
+
+    date = fields.Date(string='Date', required=True, readonly=True)
+    project_id = fields.Many2one('project.project', string='Project', required=True, ondelete='cascade',
+                                 readonly=True)
+    product_id = fields.Many2one('product.product', string='Product', required=True, ondelete='cascade',
+                                 readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True)
+    consumed_qty = fields.Float(string='Consumed (DPR)', readonly=True,
+                                help='Site stock consumption reported in daily progress reports.')
+    issued_qty = fields.Float(string='Issued', readonly=True,
+                              help='Quantity issued to the project by material request stock moves.')
+    variance_qty = fields.Float(string='Variance', readonly=True,
+                                help='Consumed minus issued quantity of the day.')
+    cumulative_variance_qty = fields.Float(string='Cumulative Variance', readonly=True, aggregator=None,
+                                           help='Running variance of the project and product up to this day.')
+    status = fields.Selection([
+        ('matched', 'Matched'),
+        ('over_consumed', 'Consumed More Than Issued'),
+        ('under_consumed', 'Issued More Than Consumed'),
+    ], string='Status', readonly=True, index=True)
+
+    _project_product_date_uniq = models.Constraint(
+        'UNIQUE(project_id, product_id, date)',
+        'Only one reconciliation line per project, product and day.',
+    )
+
+    @api.model
+    def _reconcile(self, date_from, date_to):
+        """(Re)build the reconciliation lines of ``date_from`` to ``date_to``
+        included. Lines after the range keep their daily values; their
+        cumulative variance is refreshed.
+        """
+        if date_from > date_to:
+            return
+        self._rebuild_lines(date_from, date_to)
+        self._refresh_cumulative_variance(date_from)
+        self.env.invalidate_all()
+
+    @api.model
+    def _reconcile_dates(self, dates):
+        """(Re)build the reconciliation lines of ``dates``, one range of
+        consecutive days at a time, then refresh the cumulative variance once
+        from the earliest of them.
+        """
+        dates = sorted(dates)
+        if not dates:
+            return
+        range_from = range_to = dates[0]
+        for date in dates[1:]:
+            if date != range_to + timedelta(days=1):
+                self._rebuild_lines(range_from, range_to)
+                range_from = date
+            range_to = date
+        self._rebuild_lines(range_from, range_to)
+        self._refresh_cumulative_variance(dates[0])
+        self.env.invalidate_all()
+
+    @api.model
+    def _get_move_local_date_sql(self):
+        # Move dates are UTC: take their calendar day in the company
+        # timezone, as DPR report dates are local
+        return SQL(
+            "(sm.date AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(NULLIF(cp.tz, ''), %s))::DATE",
+            self.env.user.tz or 'UTC',
+        )
+
+    @api.model
+    def _get_consumed_quantities(self, date_from, date_to):
+        """Return {(project id, product id, date): quantity} of the DPR site
+        stock consumption of ``date_from`` to ``date_to`` included, in the
+        product unit. Entries whose DPR unit cannot be converted to the
+        product unit are skipped and logged.
+        """
+        self.env.cr.execute("""
+            SELECT dp.odoo_project_id, dm.product_id, dr.report_date, dm.unit, SUM(dm.quantity)
+              FROM dpr_material dm
+              JOIN dpr_report dr ON dr.id = dm.report_id
+              JOIN dpr_project dp ON dp.id = dr.project_id
+             WHERE dm.active
+               AND dm.source = 'site_stock'
+               AND dm.product_id IS NOT NULL
+               AND dp.odoo_project_id IS NOT NULL
+               AND dr.state != 'rejected'
+               AND dr.report_date BETWEEN %s AND %s
+          GROUP BY dp.odoo_project_id, dm.product_id, dr.report_date, dm.unit
+        """, (date_from, date_to))
+        rows = self.env.cr.fetchall()
+        products = self.env['product.product'].browse({row[1] for row in rows})
+        unit_labels = dict(self.env['dpr.material']._fields['unit'].selection)
+        consumed = defaultdict(float)
+        skipped = set()
+        for project_id, product_id, date, unit, quantity in rows:
+            product_uom = products.browse(product_id).uom_id
+            dpr_uom = self.env['uom.uom']._get_dpr_unit_uom(unit, unit_labels.get(unit, ''), product_uom)
+            if not dpr_uom:
+                skipped.add((product_id, unit))
+                continue
+            consumed[project_id, product_id, date] += dpr_uom._compute_quantity(quantity, product_uom, round=False)
+        if skipped:
+            _logger.warning("DPR stock reconciliation: DPR entries skipped, unit not convertible to the product "
+                            "unit for (product id, DPR unit) %s", sorted(skipped))
+        return consumed
+
+    @api.model
+    def _rebuild_lines(self, date_from, date_to):
+        """Replace the lines of ``date_from`` to ``date_to`` included: the
+        converted DPR consumption and the issued moves, each grouped per
+        project, product and local day, are matched with one full outer join.
+        """
+        for model in ('dpr.material', 'dpr.report', 'dpr.project', 'material.request',
+                      'material.request.line', 'stock.move', 'res.company', 'res.partner'):
+            self.env[model].flush_model()
+        tolerance = float(self.env['ir.config_parameter'].sudo().get_param(
+            TOLERANCE_PARAM, DEFAULT_TOLERANCE_PERCENT)) / 100.0
+        consumed = self._get_consumed_quantities(date_from, date_to)
+        self.env.cr.execute(
+            "DELETE FROM dpr_stock_reconciliation WHERE date BETWEEN %s AND %s", (date_from, date_to))
+        self.env.cr.execute(SQL("""
+            WITH consumed AS (
+                SELECT *
+                  FROM unnest(%(project_ids)s::INTEGER[], %(product_ids)s::INTEGER[],
+                              %(dates)s::DATE[], %(quantities)s::FLOAT8[])
+                       AS c(project_id, product_id, date, qty)
+            ), issued_moves AS (
+                SELECT mr.project_id, sm.product_id, sm.product_qty, %(move_date)s AS date
+                  FROM stock_move sm
+                  JOIN material_request_line mrl ON mrl.id = sm.material_request_line_id
+                  JOIN material_request mr ON mr.id = mrl.request_id
+                  JOIN res_company rc ON rc.id = sm.company_id
+                  JOIN res_partner cp ON cp.id = rc.partner_id
+                 WHERE sm.state = 'done'
+                   AND mr.project_id IS NOT NULL
+                   AND sm.date >= %(date_from)s::DATE - 1 AND sm.date < %(date_to)s::DATE + 2
+            ), issued AS (
+                SELECT project_id, product_id, date, SUM(product_qty) AS qty
+                  FROM issued_moves
+                 WHERE date BETWEEN %(date_from)s AND %(date_to)s
+              GROUP BY project_id, product_id, date
+            ), matched AS (
+                SELECT COALESCE(c.project_id, i.project_id) AS project_id,
+                       COALESCE(c.product_id, i.product_id) AS product_id,
+                       COALESCE(c.date, i.date) AS date,
+                       COALESCE(c.qty, 0) AS consumed,
+                       COALESCE(i.qty, 0) AS issued
+                  FROM consumed c
+       FULL OUTER JOIN issued i
+                    ON i.project_id = c.project_id AND i.product_id = c.product_id AND i.date = c.date
+            )
+            INSERT INTO dpr_stock_reconciliation
+                   (date, project_id, product_id, company_id, consumed_qty, issued_qty, variance_qty, status)
+            SELECT m.date, m.project_id, m.product_id, pp.company_id, m.consumed, m.issued,
+                   m.consumed - m.issued,
+                   CASE WHEN ABS(m.consumed - m.issued) <= GREATEST(m.consumed, m.issued) * %(tolerance)s
+                        THEN 'matched'
+                        WHEN m.consumed > m.issued THEN 'over_consumed'
+                        ELSE 'under_consumed'
+                   END
+              FROM matched m
+              JOIN project_project pp ON pp.id = m.project_id
+        """,
+            project_ids=[key[0] for key in consumed],
+            product_ids=[key[1] for key in consumed],
+            dates=[key[2] for key in consumed],
+            quantities=list(consumed.values()),
+            move_date=self._get_move_local_date_sql(),
+            date_from=date_from, date_to=date_to, tolerance=tolerance,
+        ))
+
+    @api.model
+    def _get_changed_dates(self, since):
+        """Return the report dates of the DPRs and DPR materials, and the
+        local days of the issued moves, written after ``since``.
+        """
+        for model in ('dpr.material', 'dpr.report', 'stock.move'):
+            self.env[model].flush_model(['write_date'])
+        self.env.cr.execute(SQL("""
+            SELECT dr.report_date
+              FROM dpr_report dr
+             WHERE dr.write_date > %(since)s
+             UNION
+            SELECT dr.report_date
+              FROM dpr_material dm
+              JOIN dpr_report dr ON dr.id = dm.report_id
+             WHERE dm.write_date > %(since)s
+             UNION
+            SELECT %(move_date)s
+              FROM stock_move sm
+              JOIN res_company rc ON rc.id = sm.company_id
+              JOIN res_partner cp ON cp.id = rc.partner_id
+             WHERE sm.write_date > %(since)s
+               AND sm.state = 'done'
+               AND sm.material_request_line_id IS NOT NULL
+        """, since=since, move_date=self._get_move_local_date_sql()))
+        return {row[0] for row in self.env.cr.fetchall() if row[0]}
+
+    @api.model
+    def _refresh_cumulative_variance(self, date_from):
+        """Running variance per project and product for the lines from
+        ``date_from`` on, continuing from the last line before it.
+        """
+        self.env.cr.execute("""
+            UPDATE dpr_stock_reconciliation r
+               SET cumulative_variance_qty = running.total
+              FROM (
+                SELECT id,
+                       SUM(variance_qty) OVER (PARTITION BY project_id, product_id ORDER BY date) + COALESCE((
+                           SELECT prev.cumulative_variance_qty
+                             FROM dpr_stock_reconciliation prev
+                            WHERE prev.project_id = cur.project_id
+                              AND prev.product_id = cur.product_id
+                              AND prev.date < %(date_from)s
+                         ORDER BY prev.date DESC
+                            LIMIT 1
+                       ), 0) AS total
+                  FROM dpr_stock_reconciliation cur
+                 WHERE cur.date >= %(date_from)s
+              ) running
+             WHERE running.id = r.id
+        """, {'date_from': date_from})
+
+    @api.model
+    def _cron_reconcile(self):
+        """Reconcile the days completed since the last run, and again the
+        earlier days whose DPRs or issued moves were written since then.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        run_start = fields.Datetime.now()
+        yesterday = fields.Date.context_today(self) - timedelta(days=1)
+        last_date = fields.Date.to_date(ICP.get_param(LAST_DATE_PARAM))
+        last_run = fields.Datetime.to_datetime(ICP.get_param(LAST_RUN_PARAM))
+        date_from = last_date + timedelta(days=1) if last_date else yesterday - timedelta(days=INITIAL_LOOKBACK_DAYS)
+        dates = {date_from + timedelta(days=n) for n in range((yesterday - date_from).days + 1)}
+        if last_run:
+            dates.update(date for date in self._get_changed_dates(last_run) if date <= yesterday)
+        self._reconcile_dates(dates)
+        if not last_date or last_date < yesterday:
+            ICP.set_param(LAST_DATE_PARAM, fields.Date.to_string(yesterday))
+        ICP.set_param(LAST_RUN_PARAM, fields.Datetime.to_string(run_start))
+
+class DprStockReconciliationWizard(models.TransientModel):
+    _name = 'dpr.stock.reconciliation.wizard'
+    _description = 'Reconcile DPR Stock Consumption'
+
+    date_from = fields.Date(string='From', required=True,
+                            default=lambda self: fields.Date.context_today(self) - timedelta(days=30))
+    date_to = fields.Date(string='To', required=True, default=fields.Date.context_today)
+
+    def action_reconcile(self):
+        self.ensure_one()
+        if self.date_from > self.date_to:
+            raise UserError(_('The start date must be before the end date.'))
+        self.env['dpr.stock.reconciliation'].sudo()._reconcile(self.date_from, self.date_to)
+        action = self.env['ir.actions.act_window']._for_xml_id(
+            'dpr_stock_reconciliation.action_dpr_stock_reconciliation')
+        action['domain'] = [('date', '>=', self.date_from), ('date', '<=', self.date_to)]
+        return action
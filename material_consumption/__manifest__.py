@@ -22,7 +22,7 @@ Features:
     'website': 'https://www.nilamber.com',
     'license': 'LGPL-3',
     'icon': '/material_consumption/static/description/icon.png',
-    'depends': ['base', 'stock', 'sale', 'project'],
+    'depends': ['base', 'stock', 'sale', 'project', 'state_transition_log'],
     'data': [
         'data/sequence_data.xml',
         'security/security.xml',
@@ -36,6 +36,7 @@ Features:
         'views/stock_location_view.xml',
         'views/stock_scrap_view.xml',
         # 'wizards/approval_wizard_views.xml',
+        'wizards/material_request_import_views.xml',
         'report/material_request_report.xml',
 
     ],
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, http
+from odoo.http import request
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class MaterialApprovalInbox(http.Controller):
+
+    @http.route('/api/material_requests/approval_inbox', type='jsonrpc', auth='user', methods=['POST'], csrf=False)
+    def get_approval_inbox(self, **kwargs):
+        """Requests awaiting the current user's approval, paginated, with
+        counts and amounts per priority.
+        """
+        try:
+            inbox = request.env['material.request']._get_approval_inbox(
+                offset=kwargs.get('offset'),
+                limit=kwargs.get('limit'),
+                priority=kwargs.get('priority'),
+            )
+            for row in inbox['data']:
+                row['request_date'] = fields.Date.to_string(row['request_date'])
+            return {
+                'success': True,
+                'data': inbox['data'],
+                'count': len(inbox['data']),
+                'priority_totals': inbox['totals'],
+                'has_more': inbox['has_more'],
+                'next_offset': inbox['next_offset'],
+            }
+
+        except Exception as e:
+            _logger.error("Error fetching material approval inbox", exc_info=True)
+            return {
+                'success': False,
+                'error_code': 'SERVER_ERROR',
+                'message': str(e)
+            }
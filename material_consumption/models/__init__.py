@@ -5,7 +5,11 @@ from . import material_request_line
 from . import approval_history
 from . import approval_level_configuration
 from . import stock_picking
+from . import stock_move
 from . import stock_location
+from . import stock_quant
+from . import stock_warehouse
 from . import stock_scrap
+from . import uom_uom
 
 
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
 
 
@@ -35,6 +35,53 @@ class ApprovalLevelConfiguration(models.Model):
     # Company
     company_id = fields.Many2one('res.company', string='Company', default=lambda self: self.env.company)
     
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.env.registry.clear_cache()
+        records = super().create(vals_list)
+        self.env['material.request']._recompute_pending_approvers(records.company_id)
+        return records
+
+    def write(self, vals):
+        self.env.registry.clear_cache()
+        companies = self.company_id
+        res = super().write(vals)
+        self.env['material.request']._recompute_pending_approvers(companies | self.company_id)
+        return res
+
+    def unlink(self):
+        self.env.registry.clear_cache()
+        companies = self.company_id
+        res = super().unlink()
+        self.env['material.request']._recompute_pending_approvers(companies)
+        return res
+
+    @api.model
+    @tools.ormcache('company_id')
+    def _get_approval_matrix(self, company_id):
+        """Return the active approval configuration of a company as
+        ``(levels, bands)``, read once and cached in the registry:
+
+        - levels: {level_number: (configuration id, frozenset of approver group ids)}
+        - bands: tuple of (min_amount, max_amount or None, level_number,
+          configuration id) of the amount based levels, by level number
+
+        The result must not be mutated; it is invalidated on any write to
+        the configuration.
+        """
+        levels = {}
+        bands = []
+        for config in self.sudo().search_read(
+                [('company_id', '=', company_id), ('active', '=', True)],
+                ['level_number', 'approval_type', 'min_amount', 'max_amount', 'approver_group_ids'],
+                order='level_number asc, sequence asc, id asc'):
+            # Like search(limit=1): the first configuration of a level wins
+            levels.setdefault(config['level_number'], (config['id'], frozenset(config['approver_group_ids'])))
+            if config['approval_type'] == 'amount':
+                bands.append((config['min_amount'] or 0.0, config['max_amount'] or None,
+                              config['level_number'], config['id']))
+        return levels, tuple(bands)
+
     @api.constrains('sequence', 'level_number', 'company_id')
     def _check_unique_level(self):
         """Ensure unique level number per company"""
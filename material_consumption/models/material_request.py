@@ -1,11 +1,23 @@
 # -*- coding: utf-8 -*-
 
+from collections import defaultdict
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.fields import Command, Domain
+
+INBOX_PAGE_SIZE = 50
+INBOX_MAX_PAGE_SIZE = 200
+# Requests in these states, and their lines, can no longer be edited
+LOCKED_STATES = frozenset({'approved', 'issued', 'rejected', 'cancelled'})
+# Internal operations may still write these on a locked request
+LOCKED_WRITABLE_FIELDS = frozenset({'state', 'current_approval_level', 'required_approval_level', 'picking_id',
+                                    'approval_level_config_id'})
+
 
 class MaterialRequest(models.Model):
     _name = 'material.request'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'state.transition.mixin']
     _description = 'Material Request'
     _order = 'id desc'
 
@@ -68,7 +80,7 @@ class MaterialRequest(models.Model):
     ], string='Pricing Type', default='free')
 
     # Stock Information
-    picking_id = fields.Many2one('stock.picking', string='Stock Picking', readonly=True)
+    picking_id = fields.Many2one('stock.picking', string='Stock Picking', readonly=True, index='btree_not_null')
 
     # Notes
     notes = fields.Text(string='Notes')
@@ -88,11 +100,29 @@ class MaterialRequest(models.Model):
     can_current_user_approve = fields.Boolean(
         string='Can Current User Approve',
         compute='_compute_can_current_user_approve',
+        search='_search_can_current_user_approve',
         compute_sudo=True
     )
+    # Who may act on the current level of a submitted request, kept in sync
+    # with the approval matrix so inbox queries filter on indexed columns
+    pending_approver_group_ids = fields.Many2many(
+        'res.groups', 'material_request_pending_group_rel', 'request_id', 'group_id',
+        string='Pending Approver Groups',
+        compute='_compute_pending_approvers',
+        store=True,
+        help="Groups allowed to approve the current level of a submitted request."
+    )
+    pending_any_approver = fields.Boolean(
+        string='Any User May Approve',
+        compute='_compute_pending_approvers',
+        store=True,
+        index=True
+    )
     dest_location_id = fields.Many2one('stock.location', string='Destination Location')
     warehouse_id = fields.Many2one('stock.warehouse', string='Warehouse')
 
+    _approval_queue_idx = models.Index('(company_id, state, current_approval_level)')
+
     @api.onchange('is_billable')
     def _onchange_is_billable(self):
         """Clear billing fields when is_billable is unchecked"""
@@ -116,13 +146,10 @@ class MaterialRequest(models.Model):
         return super().create(vals_list)
 
     def write(self, vals):
-        for record in self:
-            if record.state in ('approved', 'issued', 'rejected', 'cancelled'):
-                # Allow state changes and some specific fields for internal operations
-                allowed_fields = {'state', 'current_approval_level', 'required_approval_level', 'picking_id',
-                                  'approval_level_config_id'}
-                if not set(vals.keys()).issubset(allowed_fields):
-                    raise UserError(_('You cannot modify a material request that has been %s.') % record.state)
+        if not LOCKED_WRITABLE_FIELDS.issuperset(vals):
+            locked_states = LOCKED_STATES.intersection(self.mapped('state'))
+            if locked_states:
+                raise UserError(_('You cannot modify a material request that has been %s.') % min(locked_states))
         return super(MaterialRequest, self).write(vals)
 
     @api.depends('line_ids.subtotal', 'current_approval_level', 'required_approval_level', 'approval_level_config_id')
@@ -130,257 +157,340 @@ class MaterialRequest(models.Model):
         for record in self:
             record.total_amount = sum(line.subtotal for line in record.line_ids)
 
+    def _get_approval_matrix(self):
+        self.ensure_one()
+        return self.env['approval.level.configuration']._get_approval_matrix(self.company_id.id)
+
+    def _can_user_approve(self, group_ids):
+        """Whether a user with ``group_ids`` (a set) may approve the current level"""
+        self.ensure_one()
+        levels, bands = self._get_approval_matrix()
+        level = levels.get(self.current_approval_level)
+        if not level:
+            return False
+        # If no approver groups are defined, any user may approve
+        return not level[1] or not level[1].isdisjoint(group_ids)
+
     @api.depends('current_approval_level', 'approval_level_config_id')
     def _compute_can_current_user_approve(self):
         """Check if current user can approve at the current approval level"""
+        user_group_ids = set(self.env.user.group_ids.ids)
         for record in self:
-            if record.state != 'submitted':
-                record.can_current_user_approve = False
-                continue
-
-            level_config = record._get_level_config(record.current_approval_level)
-            if not level_config:
-                record.can_current_user_approve = False
-                continue
-
-            # If no approver groups defined, allow any user to approve
-            if not level_config.approver_group_ids:
-                record.can_current_user_approve = True
-                continue
-
-            # Check if current user is in any of the approver groups
-            user_groups = self.env.user.group_ids
-            has_permission = any(g.id in level_config.approver_group_ids.ids for g in user_groups)
-            record.can_current_user_approve = has_permission
+            record.can_current_user_approve = record.state == 'submitted' and record._can_user_approve(user_group_ids)
+
+    def _search_can_current_user_approve(self, operator, value):
+        """Requests awaiting the current user's approval, filtered on the
+        stored pending approver groups of their current level.
+        """
+        if operator in ('in', 'not in'):
+            positive = (True in value) == (operator == 'in')
+        elif operator in ('=', '!='):
+            positive = bool(value) == (operator == '=')
+        else:
+            return NotImplemented
+        domain = Domain('state', '=', 'submitted') & (
+            Domain('pending_any_approver', '=', True)
+            | Domain('pending_approver_group_ids', 'in', self.env.user.group_ids.ids)
+        )
+        return domain if positive else ~domain
+
+    @api.depends('state', 'current_approval_level', 'company_id')
+    def _compute_pending_approvers(self):
+        for record in self:
+            levels, bands = record._get_approval_matrix()
+            level = levels.get(record.current_approval_level) if record.state == 'submitted' else None
+            record.pending_approver_group_ids = [Command.set(level[1] if level else [])]
+            record.pending_any_approver = bool(level) and not level[1]
+
+    @api.model
+    def _recompute_pending_approvers(self, companies):
+        """Refresh the pending approvers of the submitted requests of
+        ``companies`` after their approval configuration changed.
+        """
+        requests = self.sudo().search([('state', '=', 'submitted'), ('company_id', 'in', companies.ids)])
+        if requests:
+            self.env.add_to_compute(self._fields['pending_approver_group_ids'], requests)
+            self.env.add_to_compute(self._fields['pending_any_approver'], requests)
+
+    @api.model
+    def _get_approval_inbox(self, offset=0, limit=INBOX_PAGE_SIZE, priority=None):
+        """One page of the requests awaiting the current user's approval,
+        most urgent first, with request counts and amounts per priority.
+        """
+        limit = min(max(int(limit or INBOX_PAGE_SIZE), 1), INBOX_MAX_PAGE_SIZE)
+        offset = max(int(offset or 0), 0)
+        domain = Domain('can_current_user_approve', '=', True)
+        totals = {
+            priority_key: {'count': count, 'total_amount': amount}
+            for priority_key, count, amount in self._read_group(
+                domain, ['priority'], ['__count', 'total_amount:sum'])
+        }
+        if priority:
+            domain &= Domain('priority', '=', priority)
+        requests = self.search(domain, order='priority desc, request_date asc, id asc',
+                               offset=offset, limit=limit + 1)
+        has_more = len(requests) > limit
+        rows = requests[:limit].read([
+            'name', 'request_date', 'requested_by', 'project_id', 'priority',
+            'current_approval_level', 'required_approval_level', 'total_amount',
+        ])
+        return {
+            'data': rows,
+            'totals': totals,
+            'has_more': has_more,
+            'next_offset': offset + len(rows) if has_more else False,
+        }
 
     def _get_approval_config_for_amount(self, amount):
         """Get approval configuration based on amount"""
         self.ensure_one()
-        # If amount is zero, return level 1 configuration
-        if amount <= 0:
-            return self.env['approval.level.configuration'].sudo().search([
-                ('company_id', '=', self.company_id.id),
-                ('active', '=', True),
-                ('level_number', '=', 1),
-            ], limit=1)
-
-        # Search for amount-based configuration matching the total amount
-        # First try to find a configuration where the amount falls within the range
-        configs = self.env['approval.level.configuration'].sudo().search([
-            ('company_id', '=', self.company_id.id),
-            ('active', '=', True),
-            ('approval_type', '=', 'amount'),
-            ('min_amount', '<=', amount),
-            '|',
-            ('max_amount', '>=', amount),
-            ('max_amount', '=', False)
-        ], order='level_number asc')
-
-        # Return the configuration with highest level_number that matches
-        if configs:
-            return configs[-1]
-
-        # If no amount-based config found, return level 1
-        return self.env['approval.level.configuration'].sudo().search([
-            ('company_id', '=', self.company_id.id),
-            ('active', '=', True),
-            ('level_number', '=', 1),
-        ], limit=1)
+        levels, bands = self._get_approval_matrix()
+        Configuration = self.env['approval.level.configuration'].sudo()
+        # The amount band with the highest level number that matches the amount
+        if amount > 0:
+            for min_amount, max_amount, level_number, config_id in reversed(bands):
+                if min_amount <= amount and (max_amount is None or max_amount >= amount):
+                    return Configuration.browse(config_id)
+        # Zero amounts, or no amount-based configuration found: level 1
+        level = levels.get(1)
+        return Configuration.browse(level and level[0])
 
     def action_submit(self):
         """Submit the material request for approval - automatically determines approval level based on amount"""
+        Line = self.env['material.request.line']
+        line_counts = dict(Line._read_group([('request_id', 'in', self.ids)], ['request_id'], ['__count']))
+        if any(not line_counts.get(record) for record in self):
+            raise UserError(_('Please add at least one material line before submitting.'))
+
+        # Validate that tracked products have lot numbers
+        missing_lot = Line.search([
+            ('request_id', 'in', self.ids),
+            ('product_id.tracking', '!=', 'none'),
+            ('lot_id', '=', False),
+        ], limit=1)
+        if missing_lot:
+            raise UserError(
+                _('Lot/Serial number is required for product "%s" in line %s')
+                % (missing_lot.product_id.name, missing_lot.sequence)
+            )
+
+        # Auto-assign approval configuration based on amount; requests that
+        # end up with the same values are written together
+        to_write = defaultdict(lambda: self.browse())
         for record in self:
-            if not record.line_ids:
-                raise UserError(_('Please add at least one material line before submitting.'))
-
-            # Validate that tracked products have lot numbers
-            for line in record.line_ids:
-                if line.product_id.tracking != 'none' and not line.lot_id:
-                    raise UserError(
-                        _('Lot/Serial number is required for product "%s" in line %s')
-                        % (line.product_id.name, line.sequence)
-                    )
-
-            # Auto-assign approval configuration based on amount
             config = record._get_approval_config_for_amount(record.total_amount)
-            if config:
-                record.write({
-                    'approval_level_config_id': config.id,
-                    'required_approval_level': config.level_number,
-                    'current_approval_level': 1,
-                })
+            # No configuration found, use default level 1
+            to_write[config.id, config.level_number or 1] |= record
+        for (config_id, level_number), records in to_write.items():
+            vals = {
+                'required_approval_level': level_number,
+                'current_approval_level': 1,
+                'state': 'submitted',
+            }
+            if config_id:
+                vals['approval_level_config_id'] = config_id
+            records.write(vals)
+
+        self._post_workflow_messages({
+            record.id: _('Material Request submitted for approval. Required approval level: %s')
+            % record.required_approval_level
+            for record in self
+        }, _('Material Request Submitted'))
+
+        # Create approval history
+        self.env['material.approval.history'].create([{
+            'request_id': record.id,
+            'action': 'submit',
+            'approval_level': record.current_approval_level,
+        } for record in self])
+
+    def _post_workflow_messages(self, bodies, subject):
+        """Log the workflow note of every request in one batch, then notify
+        followers once per distinct set of followed requests instead of once
+        per request. Followers receive the notification by email or in Odoo
+        according to their preference.
+
+        A notification about one request is posted on it; one about several
+        requests is not bound to any record, only the notes are.
+
+        :param bodies: {request id: note body}
+        """
+        self._message_log_batch(bodies=bodies, subject=subject)
+        followers = self.env['mail.followers'].sudo().search_read([
+            ('res_model', '=', self._name),
+            ('res_id', 'in', list(bodies)),
+            ('partner_id', '!=', self.env.user.partner_id.id),
+        ], ['res_id', 'partner_id'], load=None)
+        followed = defaultdict(set)
+        for follower in followers:
+            followed[follower['partner_id']].add(follower['res_id'])
+        recipients = defaultdict(list)
+        for partner_id, request_ids in followed.items():
+            recipients[frozenset(request_ids)].append(partner_id)
+        for request_ids, partner_ids in recipients.items():
+            requests = self.browse(sorted(request_ids))
+            if len(requests) == 1:
+                requests.message_notify(partner_ids=partner_ids, subject=subject, body=bodies[requests.id])
             else:
-                # No configuration found, use default level 1
-                record.write({
-                    'required_approval_level': 1,
-                    'current_approval_level': 1,
-                })
-
-            record.state = 'submitted'
-
-            # Post to chatter
-            record.message_post(
-                body=_(
-                    'Material Request submitted for approval. Required approval level: %s') % record.required_approval_level,
-                subject=_('Material Request Submitted')
-            )
-
-            # Create approval history
-            record.approval_history_ids.create({
-                'request_id': record.id,
-                'action': 'submit',
-                'approval_level': record.current_approval_level
-            })
+                self.env['mail.thread'].message_notify(
+                    partner_ids=partner_ids, subject=subject,
+                    body=_('%(subject)s: %(names)s', subject=subject, names=', '.join(requests.mapped('name'))),
+                )
 
     def _get_level_config(self, level_number):
         """Get approval level configuration for a specific level"""
         self.ensure_one()
-        return self.env['approval.level.configuration'].sudo().search([
-            ('company_id', '=', self.company_id.id),
-            ('level_number', '=', level_number),
-            ('active', '=', True)
-        ], limit=1)
+        levels, bands = self._get_approval_matrix()
+        level = levels.get(level_number)
+        return self.env['approval.level.configuration'].sudo().browse(level and level[0])
 
     def action_approve(self):
         """Approve the material request - automatically proceeds to next level or approves if last level"""
+        user_group_ids = set(self.env.user.group_ids.ids)
         for record in self:
             # Check if user has permission to approve at this level
-            level_config = record._get_level_config(record.current_approval_level)
-            if level_config and level_config.approver_group_ids:
-                user_groups = self.env.user.group_ids
-                has_permission = any(g.id in level_config.approver_group_ids.ids for g in user_groups)
-                if not has_permission:
-                    raise UserError(
-                        _('You do not have permission to approve at level %s. Please contact an approver from the designated group.') % record.current_approval_level)
-
-            # Increment current level
-            record.current_approval_level += 1
-
-            # Check if we reached the required approval level
-            if record.current_approval_level > record.required_approval_level:
-                record.state = 'approved'
-                record.current_approval_level = record.required_approval_level
-                # Post approval message
-                record.message_post(
-                    body=_('Material Request has been fully approved at level %s') % record.required_approval_level,
-                    subject=_('Material Request Approved')
-                )
-            else:
-                # Post level approval message
-                record.message_post(
-                    body=_('Material Request approved at level %s. Waiting for level %s approval.') % (
-                        record.current_approval_level - 1, record.required_approval_level),
-                    subject=_('Level Approval')
-                )
-
-            # Create approval history
-            record.approval_history_ids.create({
-                'request_id': record.id,
-                'user_id': self.env.user.id,
-                'action': 'approve',
-                'approval_level': record.current_approval_level
-            })
+            levels, bands = record._get_approval_matrix()
+            level = levels.get(record.current_approval_level)
+            if level and level[1] and level[1].isdisjoint(user_group_ids):
+                raise UserError(
+                    _('You do not have permission to approve at level %s. Please contact an approver from the designated group.') % record.current_approval_level)
+
+        # Requests reaching the required level are approved, the others move
+        # to their next level; identical updates are written together
+        approved = self.filtered(lambda r: r.current_approval_level + 1 > r.required_approval_level)
+        pending = self - approved
+        previous_levels = {record.id: record.current_approval_level for record in pending}
+        for required_level, records in approved.grouped('required_approval_level').items():
+            records.write({'state': 'approved', 'current_approval_level': required_level})
+        for current_level, records in pending.grouped('current_approval_level').items():
+            records.write({'current_approval_level': current_level + 1})
+
+        if approved:
+            approved._post_workflow_messages({
+                record.id: _('Material Request has been fully approved at level %s') % record.required_approval_level
+                for record in approved
+            }, _('Material Request Approved'))
+        if pending:
+            pending._post_workflow_messages({
+                record.id: _('Material Request approved at level %s. Waiting for level %s approval.') % (
+                    previous_levels[record.id], record.required_approval_level)
+                for record in pending
+            }, _('Level Approval'))
+
+        # Create approval history
+        self.env['material.approval.history'].create([{
+            'request_id': record.id,
+            'user_id': self.env.user.id,
+            'action': 'approve',
+            'approval_level': record.current_approval_level,
+        } for record in self])
 
     def action_reject(self):
         """Reject the material request"""
-        for record in self:
-            record.state = 'rejected'
-
-            # Post rejection message to chatter
-            record.message_post(
-                body=_('Material Request has been rejected at approval level %s') % record.current_approval_level,
-                subject=_('Material Request Rejected')
-            )
-
-            # Create approval history
-            record.approval_history_ids.create({
-                'request_id': record.id,
-                'user_id': self.env.user.id,
-                'action': 'reject',
-                'approval_level': record.current_approval_level
-            })
+        self.write({'state': 'rejected'})
+
+        # Post rejection message to chatter
+        self._post_workflow_messages({
+            record.id: _('Material Request has been rejected at approval level %s') % record.current_approval_level
+            for record in self
+        }, _('Material Request Rejected'))
+
+        # Create approval history
+        self.env['material.approval.history'].create([{
+            'request_id': record.id,
+            'user_id': self.env.user.id,
+            'action': 'reject',
+            'approval_level': record.current_approval_level,
+        } for record in self])
 
     def action_issue_material(self):
-        """Issue materials from stock"""
-        StockMoveLine = self.env['stock.move.line']
-        for record in self:
-            if record.state != 'approved':
-                raise UserError(_('Material Request must be approved before issuing materials.'))
+        """Issue materials from stock.
+
+        Requests going to the same destination are issued together in one
+        picking; all moves are created, confirmed and reserved as a single
+        recordset, and the move lines of every picking are created in bulk.
+        """
+        not_approved = self.filtered(lambda r: r.state != 'approved')
+        if not_approved:
+            raise UserError(_('Material Request must be approved before issuing materials.'))
+        missing_lot = self.line_ids.filtered(lambda l: l.product_id.tracking != 'none' and not l.lot_id)
+        if missing_lot:
+            raise UserError(
+                _('Lot/Serial number required for product %s')
+                % missing_lot[0].product_id.display_name
+            )
 
-            # Get the first line's location as the picking's source location
-            first_line = record.line_ids[0] if record.line_ids else False
-            source_location_id = first_line.location_id.id if first_line and first_line.location_id else self.env.ref(
-                'stock.stock_location_stock').id
+        picking_type = self.env.ref('stock.picking_type_internal')
+        default_location = self.env.ref('stock.stock_location_stock')
+        groups = list(self.grouped(lambda r: (r.company_id, r.dest_location_id)).items())
 
-            picking_vals = {
+        picking_vals_list = []
+        for (company, dest_location), requests in groups:
+            # The first line's location is the picking's source location
+            first_line = requests.line_ids[:1]
+            picking_vals_list.append({
                 'partner_id': False,
-                'picking_type_id': self.env.ref('stock.picking_type_internal').id,
-                'location_id': source_location_id,
-                'location_dest_id': record.dest_location_id.id,
-                'origin': record.name,
-                'request_id': record.id,
-            }
-
-            picking = self.env['stock.picking'].create(picking_vals)
-
-            for line in record.line_ids:
-                # Use the line's location if available, otherwise use the picking's location
-                move_location_id = line.location_id.id if line.location_id else source_location_id
-
-                move = self.env['stock.move'].create({
+                'picking_type_id': picking_type.id,
+                'location_id': first_line.location_id.id or default_location.id,
+                'location_dest_id': dest_location.id,
+                'origin': ', '.join(requests.mapped('name')),
+                'request_id': requests.id if len(requests) == 1 else False,
+                'company_id': company.id,
+            })
+        pickings = self.env['stock.picking'].create(picking_vals_list)
+
+        issued_lines = self.env['material.request.line']
+        move_vals_list = []
+        for ((company, dest_location), requests), picking in zip(groups, pickings):
+            for line in requests.line_ids:
+                issued_lines |= line
+                move_vals_list.append({
                     'picking_id': picking.id,
                     'product_id': line.product_id.id,
                     'product_uom_qty': line.quantity,
                     'product_uom': line.uom_id.id,
-                    'location_id': move_location_id,
-                    'location_dest_id': picking.location_dest_id.id,
+                    # Use the line's location if available, otherwise the picking's location
+                    'location_id': line.location_id.id or picking.location_id.id,
+                    'location_dest_id': dest_location.id,
                     'description_picking': line.product_id.display_name,
+                    'company_id': company.id,
+                    'material_request_line_id': line.id,
                 })
-
-                move._action_confirm()
-
-                move._action_assign()
-
-                # LOT HANDLING
-                if line.product_id.tracking != 'none':
-                    if not line.lot_id:
-                        raise UserError(
-                            _('Lot/Serial number required for product %s')
-                            % line.product_id.display_name
-                        )
-
-                    StockMoveLine.create({
-                        'move_id': move.id,
-                        'picking_id': picking.id,
-                        'product_id': line.product_id.id,
-                        'product_uom_id': line.uom_id.id,
-                        'qty_done': line.quantity,
-                        'location_id': move_location_id,
-                        'location_dest_id': picking.location_dest_id.id,
-                        'lot_id': line.lot_id.id,
-                    })
-                else:
-                    StockMoveLine.create({
-                        'move_id': move.id,
-                        'picking_id': picking.id,
-                        'product_id': line.product_id.id,
-                        'product_uom_id': line.uom_id.id,
-                        'qty_done': line.quantity,
-                        'location_id': move_location_id,
-                        'location_dest_id': picking.location_dest_id.id,
-                    })
-
-            # VALIDATE PICKING
-            picking.button_validate()
-
-            record.picking_id = picking.id
-            record.state = 'issued'
-
-            # Post issuance message to chatter
-            record.message_post(
-                body=_('Materials have been issued. Stock Picking: %s') % picking.name,
-                subject=_('Materials Issued')
-            )
+        moves = self.env['stock.move'].create(move_vals_list)
+        # Keep one move per request line so moves and lines stay aligned
+        moves._action_confirm(merge=False)
+        moves._action_assign()
+
+        # Fully reserved untracked moves keep their reservation; the others get
+        # move lines for the exact quantity and lot of their request line
+        to_detail = [
+            (move, line) for move, line in zip(moves, issued_lines)
+            if line.product_id.tracking != 'none' or move.state != 'assigned'
+        ]
+        self.env['stock.move'].union(*(move for move, line in to_detail)).move_line_ids.unlink()
+        self.env['stock.move.line'].create([{
+            'move_id': move.id,
+            'picking_id': move.picking_id.id,
+            'product_id': line.product_id.id,
+            'product_uom_id': line.uom_id.id,
+            'quantity': line.quantity,
+            'location_id': move.location_id.id,
+            'location_dest_id': move.location_dest_id.id,
+            'lot_id': line.lot_id.id,
+        } for move, line in to_detail])
+        moves.picked = True
+
+        # VALIDATE PICKING
+        pickings.button_validate()
+
+        for ((company, dest_location), requests), picking in zip(groups, pickings):
+            requests.write({'picking_id': picking.id, 'state': 'issued'})
+            for record in requests:
+                # Post issuance message to chatter
+                record.message_post(
+                    body=_('Materials have been issued. Stock Picking: %s') % picking.name,
+                    subject=_('Materials Issued')
+                )
 
     def action_cancel(self):
         """Cancel the material request"""
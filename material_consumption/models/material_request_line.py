@@ -3,6 +3,8 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
 
+from .material_request import LOCKED_STATES
+
 
 class MaterialRequestLine(models.Model):
     _name = 'material.request.line'
@@ -75,58 +77,38 @@ class MaterialRequestLine(models.Model):
                 line.product_id and line.product_id.tracking != 'none'
             )
 
+    def _get_stock_availability(self):
+        """Stock availability of every line, {line: (quantity, lot_ids)},
+        read through the shared stock.quant availability memo.
+        """
+        keys = {line: (line.product_id.id, line.location_id._origin.id or False) for line in self if line.product_id}
+        availability = self.env['stock.quant']._get_material_availability(set(keys.values()))
+        return {line: availability[key] for line, key in keys.items()}
+
     @api.depends('product_id', 'location_id')
     def _compute_available_qty(self):
         """Compute available quantity based on selected location"""
+        availability = self._get_stock_availability()
         for line in self:
-            if not line.product_id:
-                line.available_qty = 0.0
-                continue
-            
-            domain = [
-                ('product_id', '=', line.product_id.id),
-                ('quantity', '>', 0),
-            ]
-            
-            # Filter by location if selected
-            if line.location_id:
-                domain.append(('location_id', '=', line.location_id.id))
-            
-            quants = self.env['stock.quant'].search(domain)
-            line.available_qty = sum(quant.quantity for quant in quants)
+            line.available_qty = availability.get(line, (0.0, ()))[0]
 
     @api.depends('product_id', 'location_id')
     def _compute_available_lot_ids(self):
+        availability = self._get_stock_availability()
         for line in self:
-            if not line.product_id:
-                line.available_lot_ids = False
-                continue
-
-            domain = [
-                ('product_id', '=', line.product_id.id),
-                ('quantity', '>', 0),
-                ('lot_id', '!=', False),
-            ]
-            
-            # Filter by location if selected
-            if line.location_id:
-                domain.append(('location_id', '=', line.location_id.id))
-
-            quants = self.env['stock.quant'].search(domain)
-            line.available_lot_ids = quants.mapped('lot_id')
+            line.available_lot_ids = [fields.Command.set(availability.get(line, (0.0, ()))[1])]
 
     @api.onchange('product_id')
     def _onchange_product_id(self):
+        # Default warehouse and location of the company, from the cached map
+        default_warehouse = self.env['stock.warehouse']._get_default_warehouse_map().get(self.env.company.id)
         for record in self:
             if record.product_id:
                 record.uom_id = record.product_id.uom_id.id
                 record.unit_price = record.product_id.list_price
                 record.description = record.product_id.name
-                # Set default warehouse and location based on product
-                warehouse = self.env['stock.warehouse'].search([('company_id', '=', self.env.company.id)], limit=1)
-                if warehouse:
-                    record.warehouse_id = warehouse.id
-                    record.location_id = warehouse.lot_stock_id.id
+                if default_warehouse:
+                    record.warehouse_id, record.location_id = default_warehouse
             record.lot_id = False
 
     @api.onchange('location_id')
@@ -134,13 +116,8 @@ class MaterialRequestLine(models.Model):
         """Refresh available qty and lots when location changes"""
         # Clear lot_id if it's not available in the new location
         if self.lot_id and self.location_id:
-            lot_in_location = self.env['stock.quant'].search([
-                ('product_id', '=', self.product_id.id),
-                ('lot_id', '=', self.lot_id.id),
-                ('location_id', '=', self.location_id.id),
-                ('quantity', '>', 0),
-            ], limit=1)
-            if not lot_in_location:
+            lot_ids = self._get_stock_availability().get(self, (0.0, ()))[1]
+            if self.lot_id._origin.id not in lot_ids:
                 self.lot_id = False
         elif not self.location_id:
             self.lot_id = False
@@ -156,16 +133,20 @@ class MaterialRequestLine(models.Model):
             if record.quantity <= 0:
                 raise ValidationError(_('Quantity must be greater than zero.'))
     
+    def _check_request_unlocked(self, message):
+        """Raise if any parent request is locked; the distinct parent states
+        come from one prefetched read.
+        """
+        locked_states = LOCKED_STATES.intersection(self.request_id.mapped('state'))
+        if locked_states:
+            raise UserError(message % min(locked_states))
+
     def write(self, vals):
-        for line in self:
-            if line.request_id.state in ('approved', 'issued', 'rejected', 'cancelled'):
-                raise UserError(_('You cannot modify material request lines when the request is %s.') % line.request_id.state)
+        self._check_request_unlocked(_('You cannot modify material request lines when the request is %s.'))
         return super(MaterialRequestLine, self).write(vals)
-    
+
     def unlink(self):
-        for line in self:
-            if line.request_id.state in ('approved', 'issued', 'rejected', 'cancelled'):
-                raise UserError(_('You cannot delete material request lines when the request is %s.') % line.request_id.state)
+        self._check_request_unlocked(_('You cannot delete material request lines when the request is %s.'))
         return super(MaterialRequestLine, self).unlink()
 
     @api.onchange('quantity')
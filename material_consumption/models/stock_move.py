@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+
+class StockMove(models.Model):
+    _inherit = 'stock.move'
+
+    material_request_line_id = fields.Many2one('material.request.line', string='Material Request Line',
+                                               readonly=True, copy=False, index='btree_not_null')
@@ -8,3 +8,4 @@ class StockPicking(models.Model):
     _inherit = 'stock.picking'
 
     request_id = fields.Many2one('material.request', string='Material Request', readonly=True, copy=False)
+    material_request_ids = fields.One2many('material.request', 'picking_id', string='Material Requests')
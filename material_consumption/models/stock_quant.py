@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models
+
+# Transaction-scoped memo of stock availability, see _get_material_availability
+STOCK_AVAILABILITY_KEY = 'material_consumption.stock_availability'
+
+
+class StockQuant(models.Model):
+    _inherit = 'stock.quant'
+
+    @api.model
+    def _get_material_availability(self, pairs):
+        """Return {(product_id, location_id): (quantity, lot_ids)} for the
+        given (product_id, location_id) pairs, counting positive quants only.
+
+        A False location stands for all locations of the product. Missing
+        pairs are answered with at most two grouped queries and memoized on
+        the cursor, so every compute and onchange of a form shares them until
+        a quant changes or the transaction ends.
+        """
+        cr = self.env.cr
+        if STOCK_AVAILABILITY_KEY not in cr.cache:
+            cr.postcommit.add(lambda: cr.cache.pop(STOCK_AVAILABILITY_KEY, None))
+            cr.postrollback.add(lambda: cr.cache.pop(STOCK_AVAILABILITY_KEY, None))
+        # Record rules make the answer depend on the user and allowed companies
+        memo = cr.cache.setdefault(STOCK_AVAILABILITY_KEY, {}).setdefault(
+            (self.env.uid, tuple(self.env.companies.ids)), {})
+        missing = {pair for pair in pairs if pair not in memo}
+        if missing:
+            memo.update(dict.fromkeys(missing, (0.0, ())))
+            located = {pair for pair in missing if pair[1]}
+            anywhere = {product_id for product_id, location_id in missing if not location_id}
+            if located:
+                for product, location, quantity, lot_ids in self._read_group(
+                        [('product_id', 'in', list({pair[0] for pair in located})),
+                         ('location_id', 'in', list({pair[1] for pair in located})),
+                         ('quantity', '>', 0)],
+                        ['product_id', 'location_id'], ['quantity:sum', 'lot_id:array_agg']):
+                    if (product.id, location.id) in located:
+                        memo[product.id, location.id] = (quantity, tuple({lot_id for lot_id in lot_ids if lot_id}))
+            if anywhere:
+                for product, quantity, lot_ids in self._read_group(
+                        [('product_id', 'in', list(anywhere)), ('quantity', '>', 0)],
+                        ['product_id'], ['quantity:sum', 'lot_id:array_agg']):
+                    memo[product.id, False] = (quantity, tuple({lot_id for lot_id in lot_ids if lot_id}))
+        return {pair: memo[pair] for pair in pairs}
+
+    @api.model
+    def _invalidate_material_availability(self):
+        self.env.cr.cache.pop(STOCK_AVAILABILITY_KEY, None)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self._invalidate_material_availability()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        self._invalidate_material_availability()
+        return super().write(vals)
+
+    def unlink(self):
+        self._invalidate_material_availability()
+        return super().unlink()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models, tools
+
+# Warehouse fields read by _get_default_warehouse_map
+DEFAULT_WAREHOUSE_FIELDS = {'company_id', 'lot_stock_id', 'active'}
+
+
+class StockWarehouse(models.Model):
+    _inherit = 'stock.warehouse'
+
+    @api.model
+    @tools.ormcache()
+    def _get_default_warehouse_map(self):
+        """Return {company id: (warehouse id, stock location id)} of the
+        first active warehouse of every company, cached in the registry.
+
+        The result must not be mutated; it is invalidated on any warehouse
+        create or unlink, and on a write of the fields it reads.
+        """
+        warehouse_map = {}
+        for warehouse in self.sudo().search_read([], ['company_id', 'lot_stock_id'], load=None):
+            warehouse_map.setdefault(warehouse['company_id'], (warehouse['id'], warehouse['lot_stock_id']))
+        return warehouse_map
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.env.registry.clear_cache()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if DEFAULT_WAREHOUSE_FIELDS.intersection(vals):
+            self.env.registry.clear_cache()
+        return super().write(vals)
+
+    def unlink(self):
+        self.env.registry.clear_cache()
+        return super().unlink()
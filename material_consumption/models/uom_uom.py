@@ -0,0 +1,30 @@
+from odoo import api, models
+
+# Units of measure of the DPR material unit selection; other units, such as
+# bags, only match a product unit of the same name
+DPR_UNIT_UOMS = {
+    'ton': 'uom.product_uom_ton',
+    'kg': 'uom.product_uom_kgm',
+    'cum': 'uom.product_uom_cubic_meter',
+    'sqm': 'uom.uom_square_meter',
+    'piece': 'uom.product_uom_unit',
+    'litre': 'uom.product_uom_litre',
+}
+
+
+class UomUom(models.Model):
+    _inherit = 'uom.uom'
+
+    @api.model
+    def _get_dpr_unit_uom(self, unit, unit_label, product_uom):
+        """Return the unit of measure of the DPR material ``unit`` (labelled
+        ``unit_label``) if its quantities convert to ``product_uom``, else an
+        empty recordset.
+        """
+        xmlid = DPR_UNIT_UOMS.get(unit)
+        dpr_uom = self.env.ref(xmlid, raise_if_not_found=False) if xmlid else self.browse()
+        if not dpr_uom and product_uom.name.lower() == unit_label.lower():
+            dpr_uom = product_uom
+        if not dpr_uom or not dpr_uom._has_common_reference(product_uom):
+            return self.browse()
+        return dpr_uom
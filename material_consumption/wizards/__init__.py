@@ -1,3 +1,4 @@
 # -*- coding: utf-8 -*-
 
 # from . import approval_wizard
+from . import material_request_import
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import csv
+import datetime
+import io
+import logging
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.fields import Command
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import openpyxl
+except ImportError:
+    _logger.debug('Can not import openpyxl.')
+    openpyxl = None
+
+# Header aliases, normalized to lower case with underscores
+IMPORT_COLUMNS = {
+    'request': 'request', 'reference': 'request',
+    'project': 'project',
+    'destination': 'dest_location', 'dest_location': 'dest_location', 'destination_location': 'dest_location',
+    'request_date': 'request_date', 'date': 'request_date',
+    'product_code': 'product_code', 'default_code': 'product_code', 'internal_reference': 'product_code',
+    'quantity': 'quantity', 'qty': 'quantity',
+    'uom': 'uom', 'unit': 'uom', 'unit_of_measure': 'uom',
+    'location': 'location', 'source_location': 'location',
+    'lot': 'lot', 'serial': 'lot', 'lot_serial_number': 'lot',
+    'unit_price': 'unit_price', 'price': 'unit_price',
+    'description': 'description',
+}
+REQUIRED_COLUMNS = ('product_code', 'quantity')
+
+
+def _to_text(value):
+    """Cell value as text; spreadsheets turn numeric codes into floats"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value) if value is not None else ''
+
+
+class MaterialRequestImport(models.TransientModel):
+    _name = 'material.request.import'
+    _description = 'Import Material Requests'
+
+    file = fields.Binary(string='File', required=True, attachment=False)
+    filename = fields.Char(string='File Name')
+    state = fields.Selection([
+        ('upload', 'Upload'),
+        ('done', 'Done'),
+    ], string='Status', default='upload')
+    request_ids = fields.Many2many('material.request', string='Imported Requests', readonly=True)
+    imported_line_count = fields.Integer(string='Imported Lines', readonly=True)
+    error_count = fields.Integer(string='Errors', readonly=True)
+    error_file = fields.Binary(string='Error Report', readonly=True, attachment=False)
+    error_filename = fields.Char(string='Error Report Name', readonly=True)
+
+    def _read_rows(self):
+        """Yield the data rows of the uploaded file as dicts keyed by import
+        column, with their spreadsheet row number. XLSX files are streamed
+        with openpyxl in read-only mode.
+        """
+        content = base64.b64decode(self.file)
+        if (self.filename or '').lower().endswith('.csv'):
+            text = content.decode('utf-8-sig')
+            try:
+                dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            rows = csv.reader(io.StringIO(text), dialect)
+            workbook = None
+        else:
+            if openpyxl is None:
+                raise UserError(_('The openpyxl library is required to import XLSX files; use a CSV file instead.'))
+            try:
+                workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+            except Exception as e:
+                raise UserError(_('The file could not be read as an XLSX workbook: %s', e))
+            rows = workbook.active.iter_rows(values_only=True)
+        try:
+            header = next(rows, None)
+            if not header:
+                raise UserError(_('The file is empty.'))
+            columns = [IMPORT_COLUMNS.get(str(name or '').strip().lower().replace(' ', '_').replace('/', '_'))
+                       for name in header]
+            missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+            if missing:
+                raise UserError(_('Missing required columns: %s', ', '.join(missing)))
+            for row_number, row in enumerate(rows, start=2):
+                values = {
+                    column: value.strip() if isinstance(value, str) else value
+                    for column, value in zip(columns, row)
+                    if column and value not in (None, '')
+                }
+                if values:
+                    yield row_number, values
+        finally:
+            if workbook:
+                workbook.close()
+
+    def _get_import_maps(self, rows):
+        """Resolve every reference used by ``rows`` with one lookup per model"""
+        company = self.env.company
+
+        def distinct(column):
+            return list({_to_text(values[column]) for row_number, values in rows if values.get(column)})
+
+        products = {
+            product['default_code']: product
+            for product in self.env['product.product'].search_read(
+                [('default_code', 'in', distinct('product_code'))],
+                ['default_code', 'uom_id', 'tracking', 'list_price', 'display_name'], load=None)
+        }
+        projects = {}
+        project_names = distinct('project')
+        if project_names:
+            for project in self.env['project.project'].search_read(
+                    [('name', 'in', project_names)], ['name'], order='id desc'):
+                projects[project['name']] = project['id']
+        uoms = {}
+        for uom in self.env['uom.uom'].search_read([], ['name'], order='id desc'):
+            uoms[uom['name'].lower()] = uom['id']
+        locations = {}
+        for location in self.env['stock.location'].search_read(
+                [('usage', '=', 'internal'), ('company_id', 'in', [company.id, False])],
+                ['name', 'complete_name'], order='id desc'):
+            locations[location['name'].lower()] = location['id']
+            locations[location['complete_name'].lower()] = location['id']
+        lots = {}
+        lot_names = distinct('lot')
+        tracked_ids = [product['id'] for product in products.values() if product['tracking'] != 'none']
+        if lot_names and tracked_ids:
+            for lot in self.env['stock.lot'].search_read(
+                    [('product_id', 'in', tracked_ids), ('name', 'in', lot_names)], ['product_id', 'name'],
+                    load=None):
+                lots[lot['product_id'], lot['name']] = lot['id']
+        return products, projects, uoms, locations, lots
+
+    def action_import(self):
+        self.ensure_one()
+        rows = list(self._read_rows())
+        if not rows:
+            raise UserError(_('The file does not contain any material line.'))
+        products, projects, uoms, locations, lots = self._get_import_maps(rows)
+        default_warehouse = self.env['stock.warehouse']._get_default_warehouse_map().get(self.env.company.id)
+        Uom = self.env['uom.uom']
+
+        errors = []
+        requests = {}
+        invalid = set()
+        for row_number, values in rows:
+            ref = _to_text(values.get('request')) or _('Imported')
+            row_errors = []
+            product = products.get(_to_text(values.get('product_code')))
+            if not product:
+                row_errors.append(_('Unknown product code "%s"', values.get('product_code', '')))
+            try:
+                quantity = float(values['quantity'])
+                if quantity <= 0:
+                    row_errors.append(_('Quantity must be greater than zero.'))
+            except (KeyError, TypeError, ValueError):
+                quantity = 0.0
+                row_errors.append(_('Invalid quantity "%s"', values.get('quantity', '')))
+            uom_id = product and product['uom_id']
+            if values.get('uom'):
+                uom_id = uoms.get(_to_text(values['uom']).lower())
+                if not uom_id:
+                    row_errors.append(_('Unknown unit of measure "%s"', values['uom']))
+                elif product and not Uom.browse(uom_id)._has_common_reference(Uom.browse(product['uom_id'])):
+                    row_errors.append(_('Unit of measure "%(uom)s" cannot be converted to the unit of product '
+                                        '%(product)s', uom=values['uom'], product=product['display_name']))
+                    uom_id = False
+            location_id = default_warehouse and default_warehouse[1]
+            if values.get('location'):
+                location_id = locations.get(_to_text(values['location']).lower())
+                if not location_id:
+                    row_errors.append(_('Unknown location "%s"', values['location']))
+            lot_id = False
+            if product and product['tracking'] != 'none':
+                lot_id = lots.get((product['id'], _to_text(values.get('lot'))))
+                if not lot_id:
+                    row_errors.append(_('Lot/Serial number "%(lot)s" not found for tracked product %(product)s',
+                                        lot=values.get('lot', ''), product=product['display_name']))
+            if product and product['tracking'] == 'serial' and uom_id and quantity > 0:
+                product_qty = Uom.browse(uom_id)._compute_quantity(
+                    quantity, Uom.browse(product['uom_id']), rounding_method='HALF-UP')
+                if product_qty != 1:
+                    row_errors.append(_('Serial-tracked product %s must be imported with a quantity of 1 per '
+                                        'serial number.', product['display_name']))
+            try:
+                unit_price = float(values['unit_price']) if 'unit_price' in values else product and product['list_price']
+            except (TypeError, ValueError):
+                unit_price = 0.0
+                row_errors.append(_('Invalid unit price "%s"', values['unit_price']))
+
+            request_vals = requests.get(ref)
+            if request_vals is None:
+                request_vals = requests[ref] = {'request_date': fields.Date.context_today(self), 'line_ids': []}
+                if values.get('project'):
+                    request_vals['project_id'] = projects.get(_to_text(values['project']))
+                    if not request_vals['project_id']:
+                        row_errors.append(_('Unknown project "%s"', values['project']))
+                if values.get('dest_location'):
+                    request_vals['dest_location_id'] = locations.get(_to_text(values['dest_location']).lower())
+                    if not request_vals['dest_location_id']:
+                        row_errors.append(_('Unknown destination location "%s"', values['dest_location']))
+                if values.get('request_date'):
+                    request_date = values['request_date']
+                    try:
+                        request_vals['request_date'] = (request_date.date()
+                                                        if isinstance(request_date, datetime.datetime)
+                                                        else fields.Date.to_date(request_date))
+                    except (TypeError, ValueError):
+                        row_errors.append(_('Invalid request date "%s"', request_date))
+
+            if row_errors:
+                invalid.add(ref)
+                errors.extend((row_number, ref, message) for message in row_errors)
+                continue
+            request_vals['line_ids'].append(Command.create({
+                'product_id': product['id'],
+                'quantity': quantity,
+                'uom_id': uom_id,
+                'unit_price': unit_price,
+                'description': values.get('description') or product['display_name'],
+                'warehouse_id': default_warehouse and default_warehouse[0],
+                'location_id': location_id,
+                'lot_id': lot_id,
+            }))
+
+        # A request is only created when all of its rows are valid
+        for ref in invalid:
+            errors.append((False, ref, _('Request not imported because some of its rows have errors.')))
+        vals_list = [vals for ref, vals in requests.items() if ref not in invalid]
+        created = self.env['material.request'].create(vals_list) if vals_list else self.env['material.request']
+
+        self.write({
+            'state': 'done',
+            'request_ids': [Command.set(created.ids)],
+            'imported_line_count': sum(len(vals['line_ids']) for vals in vals_list),
+            'error_count': len(errors),
+            'error_file': self._build_error_report(errors),
+            'error_filename': 'material_request_import_errors.csv' if errors else False,
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    @api.model
+    def _build_error_report(self, errors):
+        if not errors:
+            return False
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow([_('Row'), _('Request'), _('Error')])
+        writer.writerows(sorted(errors, key=lambda error: (error[0] or 0, error[1])))
+        return base64.b64encode(output.getvalue().encode('utf-8'))
+
+    def action_open_requests(self):
+        self.ensure_one()
+        return {
+            'name': _('Imported Material Requests'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'material.request',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', self.request_ids.ids)],
+        }
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+{
+    'name': 'Material Consumption Forecast',
+    'version': '19.0.1.0.0',
+    'category': 'Inventory',
+    'summary': 'Rolling consumption rates, days to stockout and suggested purchase requisitions',
+    'description': """
+Material Consumption Forecast
+=============================
+
+Projects future material demand of construction sites.
+
+- Daily consumption series per project and product from DPR material entries,
+  falling back to issued material requests
+- Rolling consumption rates computed with vectorized NumPy windows
+- Days to stockout for every site location of a project
+- Nightly job generating suggested purchase requisition drafts in batch
+    """,
+    'author': 'Nilamber',
+    'company': 'Nilamber',
+    'website': 'https://www.nilamber.com',
+    'depends': [
+        'construction_dpr',
+        'material_consumption',
+        'material_purchase_requisitions_dashboard',
+    ],
+    'external_dependencies': {
+        'python': ['numpy'],
+    },
+    'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
+        'views/material_consumption_forecast_views.xml',
+    ],
+    'installable': True,
+    'application': False,
+    'license': 'LGPL-3',
+}
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+
+from . import material_consumption_forecast
+from . import purchase_requisition
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+
+from odoo import api, fields, models, _
+from odoo.fields import Command
+
+_logger = logging.getLogger(__name__)
+
+FORECAST_WINDOW_DAYS = 30
+SHORT_WINDOW_DAYS = 7
+DEFAULT_COVER_DAYS = 14
+# No expected stockout date is given beyond this horizon
+STOCKOUT_HORIZON_DAYS = 366
+COVER_DAYS_PARAM = 'material_consumption_forecast.cover_days'
+
+class MaterialConsumptionForecast(models.Model):
+    _name = 'material.consumption.forecast'
+    _description = 'Material Consumption Forecast'
+    _order = 'days_to_stockout asc, id asc'
+    _log_access = False
+
+    forecast_date = fields.Date(string='Forecast Date', required=True, readonly=True)
+    project_id = fields.Many2one('project.project', string='Project', required=True, ondelete='cascade',
+                                 readonly=True)
+    product_id = fields.Many2one('product.product', string='Product', required=True, ondelete='cascade',
+                                 readonly=True)
+    uom_id = fields.Many2one(related='product_id.uom_id', string='Unit of Measure')
+    location_id = fields.Many2one('stock.location', string='Site Location', required=True, ondelete='cascade',
+                                  readonly=True, help='Site location of the project that receives the replenishment.')
+    company_id = fields.Many2one('res.company', string='Company', readonly=True)
+    short_rate = fields.Float(string='7-Day Rate', readonly=True, aggregator='avg',
+                              help='Average daily consumption over the last 7 days.')
+    long_rate = fields.Float(string='30-Day Rate', readonly=True, aggregator='avg',
+                             help='Average daily consumption over the last 30 days.')
+    peak_rate = fields.Float(string='Peak 7-Day Rate', readonly=True, aggregator='max',
+                             help='Highest 7-day average daily consumption within the last 30 days.')
+    daily_rate = fields.Float(string='Forecast Daily Rate', readonly=True, aggregator='avg',
+                              help='Higher of the 7-day and 30-day rates, used for the projection.')
+    on_hand_qty = fields.Float(string='On Hand', readonly=True,
+                               help='Stock on hand in all the site locations of the project.')
+    days_to_stockout = fields.Float(string='Days to Stockout', readonly=True, aggregator='min')
+    stockout_date = fields.Date(string='Expected Stockout', readonly=True)
+    suggested_qty = fields.Float(string='Suggested Quantity', readonly=True)
+    requisition_id = fields.Many2one('material.purchase.requisition', string='Suggested Requisition',
+                                     ondelete='set null', readonly=True)
+
+    _project_product_idx = models.Index('(project_id, product_id)')
+
+    @api.model
+    def _get_daily_consumption(self, date_from, date_to):
+        """Return [(project_id, product_id, date, quantity)] of the daily
+        consumption in the product unit, from DPR site stock entries or, for
+        project products never reported in a DPR, from issued material
+        requests. Both sides are read with one grouped query each.
+
+        DPR quantities are converted from their DPR unit to the product unit;
+        entries whose unit cannot be converted are skipped and logged.
+        """
+        for model in ('dpr.material', 'dpr.report', 'dpr.project', 'material.request', 'material.request.line'):
+            self.env[model].flush_model()
+        self.env.cr.execute("""
+            SELECT dp.odoo_project_id, dm.product_id, dr.report_date, dm.unit, SUM(dm.quantity)
+              FROM dpr_material dm
+              JOIN dpr_report dr ON dr.id = dm.report_id
+              JOIN dpr_project dp ON dp.id = dr.project_id
+             WHERE dm.active
+               AND dm.source = 'site_stock'
+               AND dm.product_id IS NOT NULL
+               AND dp.odoo_project_id IS NOT NULL
+               AND dr.state != 'rejected'
+               AND dr.report_date >= %s AND dr.report_date < %s
+          GROUP BY dp.odoo_project_id, dm.product_id, dr.report_date, dm.unit
+        """, (date_from, date_to))
+        reports = self.env.cr.fetchall()
+        products = self.env['product.product'].browse({row[1] for row in reports})
+        unit_labels = dict(self.env['dpr.material']._fields['unit'].selection)
+        series = []
+        skipped = set()
+        for project_id, product_id, date, unit, quantity in reports:
+            product_uom = products.browse(product_id).uom_id
+            dpr_uom = self.env['uom.uom']._get_dpr_unit_uom(unit, unit_labels.get(unit, ''), product_uom)
+            if not dpr_uom:
+                skipped.add((product_id, unit))
+                continue
+            series.append((project_id, product_id, date, dpr_uom._compute_quantity(quantity, product_uom, round=False)))
+        if skipped:
+            _logger.warning("Consumption forecast: DPR entries skipped, unit not convertible to the product "
+                            "unit for (product id, DPR unit) %s", sorted(skipped))
+        reported = {(project_id, product_id) for project_id, product_id, date, quantity in series}
+
+        self.env.cr.execute("""
+            SELECT mr.project_id, mrl.product_id, mr.request_date, mrl.uom_id, SUM(mrl.quantity)
+              FROM material_request_line mrl
+              JOIN material_request mr ON mr.id = mrl.request_id
+             WHERE mr.state = 'issued'
+               AND mr.project_id IS NOT NULL
+               AND mr.request_date >= %s AND mr.request_date < %s
+          GROUP BY mr.project_id, mrl.product_id, mr.request_date, mrl.uom_id
+        """, (date_from, date_to))
+        issues = [row for row in self.env.cr.fetchall() if (row[0], row[1]) not in reported]
+        products = self.env['product.product'].browse({row[1] for row in issues})
+        uoms = self.env['uom.uom'].browse({row[3] for row in issues})
+        for project_id, product_id, date, uom_id, quantity in issues:
+            uom = uoms.browse(uom_id)
+            product_uom = products.browse(product_id).uom_id
+            if uom and product_uom and uom != product_uom:
+                quantity = uom._compute_quantity(quantity, product_uom, round=False)
+            series.append((project_id, product_id, date, quantity))
+        return series
+
+    @api.model
+    def _compute_rates(self, series, date_from, window):
+        """Vectorized rolling rates over the daily series.
+
+        :return: (keys, short rates, long rates, peak rates) where keys are
+            the (project_id, product_id) rows of the NumPy arrays
+        """
+        keys = sorted({(project_id, product_id) for project_id, product_id, date, quantity in series})
+        if not keys:
+            empty = np.zeros(0)
+            return keys, empty, empty, empty
+        key_index = {key: i for i, key in enumerate(keys)}
+        rows = np.fromiter((key_index[row[0], row[1]] for row in series), dtype=np.int64, count=len(series))
+        days = np.fromiter(((row[2] - date_from).days for row in series), dtype=np.int64, count=len(series))
+        quantities = np.fromiter((row[3] or 0.0 for row in series), dtype=np.float64, count=len(series))
+
+        matrix = np.zeros((len(keys), window))
+        np.add.at(matrix, (rows, days), quantities)
+        # Rolling sums from the cumulative sum: window i covers days [i, i + short)
+        cumulative = np.concatenate([np.zeros((len(keys), 1)), np.cumsum(matrix, axis=1)], axis=1)
+        short = min(SHORT_WINDOW_DAYS, window)
+        rolling = (cumulative[:, short:] - cumulative[:, :-short]) / short
+        return keys, rolling[:, -1], cumulative[:, -1] / window, rolling.max(axis=1)
+
+    @api.model
+    def _run_forecast(self, window=FORECAST_WINDOW_DAYS):
+        """Rebuild the forecast of every project and product and regenerate
+        the suggested purchase requisition drafts. A draft suggestion a user
+        has edited is kept, and no new suggestion is made for its project
+        site.
+        """
+        today = fields.Date.context_today(self)
+        date_from = today - timedelta(days=window)
+        cover_days = float(self.env['ir.config_parameter'].sudo().get_param(COVER_DAYS_PARAM, DEFAULT_COVER_DAYS))
+
+        keys, short_rates, long_rates, peak_rates = self._compute_rates(
+            self._get_daily_consumption(date_from, today), date_from, window)
+        daily_rates = np.maximum(short_rates, long_rates)
+
+        self.search([]).unlink()
+        # Drafts a user edited since the forecast created them are kept
+        suggestions = self.env['material.purchase.requisition'].search([
+            ('forecast_suggestion', '=', True),
+            ('state', '=', 'draft'),
+        ])
+        edited = suggestions.filtered(lambda r: r.write_date != r.create_date or any(
+            line.write_date != line.create_date for line in r.requisition_line_ids))
+        (suggestions - edited).unlink()
+
+        # DPR consumption is reported per project, not per site: the stock of
+        # every internal location of the project covers it, and the first
+        # site location of the project receives the replenishment
+        locations_per_project = defaultdict(list)
+        for location in self.env['stock.location'].search([
+                ('project_id', 'in', list({project_id for project_id, product_id in keys})),
+                ('usage', '=', 'internal')], order='id'):
+            locations_per_project[location.project_id.id].append(location.id)
+
+        rows = [i for i, (project_id, product_id) in enumerate(keys)
+                if daily_rates[i] > 0 and locations_per_project.get(project_id)]
+        if not rows:
+            return self.browse()
+        availability = self.env['stock.quant']._get_material_availability({
+            (keys[i][1], location_id) for i in rows for location_id in locations_per_project[keys[i][0]]
+        })
+        key_rows = np.array(rows, dtype=np.int64)
+        on_hand = np.fromiter(
+            (sum(availability[keys[i][1], location_id][0] for location_id in locations_per_project[keys[i][0]])
+             for i in rows),
+            dtype=np.float64, count=len(rows))
+        rates = daily_rates[key_rows]
+        days_to_stockout = np.maximum(on_hand, 0.0) / rates
+        suggested = np.where(days_to_stockout < cover_days, np.ceil(rates * cover_days - on_hand), 0.0)
+
+        projects = self.env['project.project'].browse({keys[i][0] for i in rows})
+        vals_list = []
+        for n, i in enumerate(rows):
+            project_id, product_id = keys[i]
+            vals_list.append({
+                'forecast_date': today,
+                'project_id': project_id,
+                'product_id': product_id,
+                'location_id': locations_per_project[project_id][0],
+                'company_id': projects.browse(project_id).company_id.id,
+                'short_rate': short_rates[i],
+                'long_rate': long_rates[i],
+                'peak_rate': peak_rates[i],
+                'daily_rate': rates[n],
+                'on_hand_qty': on_hand[n],
+                'days_to_stockout': days_to_stockout[n],
+                'stockout_date': (today + timedelta(days=int(days_to_stockout[n]))
+                                  if days_to_stockout[n] < STOCKOUT_HORIZON_DAYS else False),
+                'suggested_qty': max(suggested[n], 0.0),
+            })
+        forecasts = self.create(vals_list)
+        edited_sites = {(r.project_id, r.site_location) for r in edited}
+        forecasts.filtered(
+            lambda f: f.suggested_qty and (f.project_id, f.location_id) not in edited_sites
+        )._create_suggested_requisitions()
+        return forecasts
+
+    def _create_suggested_requisitions(self):
+        """Create one draft purchase requisition per project site for the
+        forecasts in ``self``, with one create per company.
+        """
+        for company, company_forecasts in self.grouped('company_id').items():
+            Requisition = self.env['material.purchase.requisition'].with_company(company)
+            price_map = self.env['purchase.price.history']._get_price_map(company_forecasts.product_id,
+                                                                          company=company)
+            groups = []
+            for (project, location), forecasts in company_forecasts.grouped(
+                    lambda f: (f.project_id, f.location_id)).items():
+                employee = project.user_id.employee_id
+                if not employee:
+                    _logger.warning("Consumption forecast: no employee for the manager of project %s, "
+                                    "no requisition suggested", project.display_name)
+                    continue
+                groups.append((forecasts, {
+                    'employee_id': employee.id,
+                    'department_id': employee.department_id.id,
+                    'company_id': company.id,
+                    'project_id': project.id,
+                    'site_location': location.id,
+                    'requisition_type': 'purchase',
+                    'forecast_suggestion': True,
+                    'reason': _('Suggested by the consumption forecast of %s', fields.Date.to_string(
+                        forecasts[0].forecast_date)),
+                    'requisition_line_ids': [Command.create({
+                        'product_id': forecast.product_id.id,
+                        'description': forecast.product_id.display_name,
+                        'qty': forecast.suggested_qty,
+                        'uom': forecast.product_id.uom_id.id,
+                        'price_unit': (price_map.get((forecast.product_id.id, False, forecast.product_id.uom_id.id))
+                                       or {}).get('last_price', 0.0),
+                    }) for forecast in forecasts],
+                }))
+            if not groups:
+                continue
+            requisitions = Requisition.create([vals for forecasts, vals in groups])
+            for (forecasts, vals), requisition in zip(groups, requisitions):
+                forecasts.requisition_id = requisition
+
+    @api.model
+    def _cron_run_forecast(self):
+        self._run_forecast()
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+
+from odoo import fields, models
+
+
+class MaterialPurchaseRequisition(models.Model):
+    _inherit = 'material.purchase.requisition'
+
+    forecast_suggestion = fields.Boolean(
+        string='Forecast Suggestion',
+        copy=False,
+        readonly=True,
+        help='Draft generated by the consumption forecast; replaced on the next run while still in draft.',
+    )
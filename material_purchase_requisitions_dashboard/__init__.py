@@ -2,4 +2,8 @@
 
 from . import models
 
+
+def _post_init_rebuild_price_history(env):
+    env['purchase.price.history']._rebuild()
+
 # vim:expandtab:smartindent:tabstop=4:softtabstop=4:shiftwidth=4:
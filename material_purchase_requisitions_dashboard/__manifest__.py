@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Product/Material Purchase Requisitions with Comparison Dashboard',
-    'version': '19.0.1.0.0',
+    'version': '19.0.1.0.1',
     'sequence': -1,
     'summary': """This module allow your employees/users to create Purchase Requisitions.""",
     'description': """
@@ -88,6 +88,8 @@
         'stock',
         'hr',
         'purchase',
+        'project',
+        'state_transition_log',
     ],
     'data': [
         'data/ir_model_data.xml',
@@ -95,12 +97,14 @@
         'security/multi_company_security.xml',
         'security/ir.model.access.csv',
         'data/purchase_requisition_sequence.xml',
+        'data/ir_cron_data.xml',
         'data/employee_purchase_approval_template.xml',
         'data/confirm_template_material_purchase.xml',
         'report/purchase_requisition_report.xml',
         'views/purchase_requisition_view.xml',
         'views/reject_reason_wizard.xml',
         'views/requisition_history_view.xml',
+        'views/purchase_price_history_view.xml',
         'views/rfq_wizard_view.xml',
         'views/rfq_zero_price_confirm_wizard.xml',
         'views/rfq_line_zero_price_confirm_wizard.xml',
@@ -120,6 +124,7 @@
             'material_purchase_requisitions_dashboard/static/src/xml/rfq_comp_dashboard.xml',
         ],
     },
+    'post_init_hook': '_post_init_rebuild_price_history',
     'installable': True,
     'application': False,
     'license': 'LGPL-3',
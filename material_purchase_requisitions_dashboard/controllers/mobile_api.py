@@ -1,11 +1,20 @@
 # -*- coding: utf-8 -*-
 from odoo import http
 from odoo.http import request
+from odoo.tools import escape_psql
+import hashlib
 import json
 import logging
 
 _logger = logging.getLogger(__name__)
 
+REQUISITION_PAGE_SIZE = 50
+REQUISITION_MAX_PAGE_SIZE = 200
+HISTORY_PAGE_SIZE = 20
+CATALOGUE_PAGE_SIZE = 50
+CATALOGUE_MAX_PAGE_SIZE = 200
+CATALOGUE_DELTA_SIZE = 2000
+
 
 class PurchaseRequisitionMobileAPI(http.Controller):
 
@@ -49,36 +58,85 @@ class PurchaseRequisitionMobileAPI(http.Controller):
                 return {'success': False, 'error_code': 'MISSING_STATE', 'message': 'Project State is required'}
 
 
-            domain = [('employee_id', '=', employee.hr_employee_id.id,)]
+            limit = min(max(int(kwargs.get('limit') or REQUISITION_PAGE_SIZE), 1), REQUISITION_MAX_PAGE_SIZE)
+            base_domain = [('employee_id', '=', employee.hr_employee_id.id,)]
+            domain = list(base_domain)
             if state and state != 'all':
                 domain.append(('state', '=', state))
 
-            requisitions = request.env['material.purchase.requisition'].sudo().search(
+            # Keyset cursor "<request_date or empty>|<id>" from the previous page
+            cursor = kwargs.get('cursor')
+            if cursor:
+                cursor_date, cursor_id = cursor.rsplit('|', 1)
+                cursor_id = int(cursor_id)
+                if cursor_date:
+                    domain += ['|', '|',
+                               ('request_date', '<', cursor_date),
+                               ('request_date', '=', False),
+                               '&', ('request_date', '=', cursor_date), ('id', '<', cursor_id)]
+                else:
+                    domain += [('request_date', '=', False), ('id', '<', cursor_id)]
+
+            Requisition = request.env['material.purchase.requisition'].sudo()
+            requisitions = Requisition.search(
                 domain,
-                order='request_date desc, id desc'
+                order='request_date desc nulls last, id desc',
+                limit=limit + 1,
             )
+            has_more = len(requisitions) > limit
+            requisitions = requisitions[:limit]
+
+            # Many2one display names come back batched per model from read()
+            rows = requisitions.read([
+                'name', 'employee_id', 'department_id', 'project_id', 'request_date',
+                'receive_date', 'requisition_type', 'state', 'reason', 'reject_reason',
+            ])
+            line_counts = {
+                req.id: count
+                for req, count in request.env['material.purchase.requisition.line'].sudo()._read_group(
+                    [('requisition_id', 'in', requisitions.ids)],
+                    groupby=['requisition_id'],
+                    aggregates=['__count'],
+                )
+            }
 
             data = []
-            for req in requisitions:
+            for row in rows:
                 data.append({
-                    'id': req.id,
-                    'name': req.name,
-                    'employee_id': [req.employee_id.id, req.employee_id.name] if req.employee_id else False,
-                    'department_id': [req.department_id.id, req.department_id.name] if req.department_id else False,
-                    'project_id': [req.project_id.id, req.project_id.name] if req.project_id else False,
-                    'request_date': req.request_date.strftime('%Y-%m-%d') if req.request_date else False,
-                    'receive_date': req.receive_date.strftime('%Y-%m-%d') if req.receive_date else False,
-                    'requisition_type': req.requisition_type,
-                    'state': req.state,
-                    'reason': req.reason,
-                    'reject_reason': req.reject_reason,
-                    'line_count': len(req.requisition_line_ids.ids),
+                    'id': row['id'],
+                    'name': row['name'],
+                    'employee_id': row['employee_id'],
+                    'department_id': row['department_id'],
+                    'project_id': row['project_id'],
+                    'request_date': row['request_date'].strftime('%Y-%m-%d') if row['request_date'] else False,
+                    'receive_date': row['receive_date'].strftime('%Y-%m-%d') if row['receive_date'] else False,
+                    'requisition_type': row['requisition_type'],
+                    'state': row['state'],
+                    'reason': row['reason'],
+                    'reject_reason': row['reject_reason'],
+                    'line_count': line_counts.get(row['id'], 0),
                 })
 
+            next_cursor = False
+            if has_more and rows:
+                last = rows[-1]
+                last_date = last['request_date'].strftime('%Y-%m-%d') if last['request_date'] else ''
+                next_cursor = f"{last_date}|{last['id']}"
+
+            # Tab badges: one grouped count over all of the employee's requisitions
+            state_totals = {
+                state_key: count
+                for state_key, count in Requisition._read_group(base_domain, ['state'], ['__count'])
+            }
+            state_totals['all'] = sum(state_totals.values())
+
             return {
                 'success': True,
                 'data': data,
-                'count': len(data)
+                'count': len(data),
+                'state_totals': state_totals,
+                'next_cursor': next_cursor,
+                'has_more': has_more,
             }
 
         except Exception as e:
@@ -122,9 +180,13 @@ class PurchaseRequisitionMobileAPI(http.Controller):
                     'uom': [line.uom.id, line.uom.name] if line.uom else False,
                 })
 
-            # Get state history
+            # Get state history, newest first, one page at a time
+            history_limit = min(max(int(kwargs.get('history_limit') or HISTORY_PAGE_SIZE), 1), REQUISITION_MAX_PAGE_SIZE)
+            history_rows = requisition._get_state_transition_history(
+                limit=history_limit + 1, before=kwargs.get('history_before'))
+            history_has_more = len(history_rows) > history_limit
             history = []
-            for hist in requisition.state_history_ids:
+            for hist in history_rows[:history_limit]:
                 history.append({
                     'id': hist.id,
                     'from_state': hist.from_state,
@@ -152,6 +214,7 @@ class PurchaseRequisitionMobileAPI(http.Controller):
                 'reject_reason': requisition.reject_reason,
                 'requisition_line_ids': lines,
                 'state_history_ids': history,
+                'state_history_has_more': history_has_more,
             }
 
             return {
@@ -287,8 +350,25 @@ class PurchaseRequisitionMobileAPI(http.Controller):
                 'message': str(e)
             }
 
+    def _get_catalogue_domain(self, search=None, categ_id=None):
+        """Build the purchasable product domain for the mobile catalogue"""
+        domain = [('purchase_ok', '=', True)]
+        if categ_id:
+            domain.append(('categ_id', 'child_of', int(categ_id)))
+        if search:
+            # Literal substring match: user supplied % and _ are not wildcards
+            pattern = '%' + escape_psql(search.strip()) + '%'
+            domain += ['|',
+                       ('default_code', '=ilike', pattern),
+                       ('name', '=ilike', pattern)]
+        return domain
+
+    def _compute_etag(self, *parts):
+        return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+
     @http.route('/api/mobile/purchase_requisitions/products', type='jsonrpc', auth='public',cors='*', methods=['POST'], csrf=False)
     def get_products(self, **kwargs):
+        """Paginated product catalogue with search, category filter and ETag"""
         try:
             employee = self._get_authenticated_employee()
             if not employee:
@@ -298,31 +378,50 @@ class PurchaseRequisitionMobileAPI(http.Controller):
                     'message': 'Invalid or expired token'
                 }
 
-            # params = request.jsonrequest.get('params', {})
-            # search = params.get('search', '')
-
-            domain = [('purchase_ok', '=', True)]
+            page = max(int(kwargs.get('page') or 1), 1)
+            page_size = min(max(int(kwargs.get('page_size') or CATALOGUE_PAGE_SIZE), 1), CATALOGUE_MAX_PAGE_SIZE)
+            domain = self._get_catalogue_domain(kwargs.get('search'), kwargs.get('categ_id'))
 
-            # if search:
-            #     domain.append('|')
-            #     domain.append(('name', 'ilike', search))
-            #     domain.append(('default_code', 'ilike', search))
+            Product = request.env['product.product'].sudo()
+            total = Product.search_count(domain)
+            products = Product.search(
+                domain, offset=(page - 1) * page_size, limit=page_size, order='default_code, id'
+            )
+            rows = products.read(['name', 'default_code', 'uom_id', 'categ_id'])
 
-            products = request.env['product.product'].sudo().search(domain, limit=100)
+            # Built from the returned values: template edits (name, category,
+            # uom) do not touch the variant write_date
+            etag = self._compute_etag(
+                domain, page, page_size, total,
+                [[row['id'], row['name'], row['default_code'], row['uom_id'], row['categ_id']] for row in rows],
+            )
+            client_etag = kwargs.get('etag') or request.httprequest.headers.get('If-None-Match')
+            if client_etag and client_etag.strip('"') == etag:
+                return {
+                    'success': True,
+                    'not_modified': True,
+                    'etag': etag,
+                }
 
             data = []
-            for product in products:
+            for row in rows:
                 data.append({
-                    'id': product.id,
-                    'name': product.name,
-                    'default_code': product.default_code,
-                    'uom_id': [product.uom_id.id, product.uom_id.name] if product.uom_id else False,
+                    'id': row['id'],
+                    'name': row['name'],
+                    'default_code': row['default_code'],
+                    'uom_id': row['uom_id'],
+                    'categ_id': row['categ_id'],
                 })
 
             return {
                 'success': True,
                 'data': data,
-                'count': len(data)
+                'count': len(data),
+                'total': total,
+                'page': page,
+                'page_size': page_size,
+                'has_more': page * page_size < total,
+                'etag': etag,
             }
 
         except Exception as e:
@@ -332,3 +431,71 @@ class PurchaseRequisitionMobileAPI(http.Controller):
                 'error_code': 'SERVER_ERROR',
                 'message': str(e)
             }
+
+    @http.route('/api/mobile/purchase_requisitions/products/delta', type='jsonrpc', auth='public',cors='*', methods=['POST'], csrf=False)
+    def get_products_delta(self, **kwargs):
+        """Compact catalogue changes since a cursor, for offline clients.
+
+        Rows are ``[id, name, default_code, uom_id, categ_id, available]``;
+        products that were archived or are no longer purchasable come back
+        with ``available`` false so the client can drop them.
+        """
+        try:
+            employee = self._get_authenticated_employee()
+            if not employee:
+                return {
+                    'success': False,
+                    'error_code': 'UNAUTHORIZED',
+                    'message': 'Invalid or expired token'
+                }
+
+            limit = min(max(int(kwargs.get('limit') or CATALOGUE_DELTA_SIZE), 1), CATALOGUE_DELTA_SIZE)
+            cursor = kwargs.get('cursor')
+            since, last_id = '1970-01-01 00:00:00', 0
+            if cursor:
+                since, last_id = cursor.rsplit('|', 1)
+                last_id = int(last_id)
+
+            # Template edits (name, category, uom) do not touch the variant write_date
+            request.env.cr.execute("""
+                SELECT pp.id, GREATEST(pp.write_date, pt.write_date) AS changed
+                  FROM product_product pp
+                  JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                 WHERE (GREATEST(pp.write_date, pt.write_date), pp.id) > (%s::timestamp, %s)
+              ORDER BY changed, pp.id
+                 LIMIT %s
+            """, (since, last_id, limit))
+            changes = request.env.cr.fetchall()
+
+            Product = request.env['product.product'].sudo().with_context(active_test=False)
+            products = Product.browse([product_id for product_id, _changed in changes])
+            products.fetch(['name', 'default_code', 'uom_id', 'categ_id', 'active', 'purchase_ok'])
+            data = [[
+                product.id,
+                product.name,
+                product.default_code or False,
+                product.uom_id.id,
+                product.categ_id.id,
+                product.active and product.purchase_ok,
+            ] for product in products]
+
+            next_cursor = cursor
+            if changes:
+                last_product_id, changed = changes[-1]
+                next_cursor = f"{changed}|{last_product_id}"
+
+            return {
+                'success': True,
+                'data': data,
+                'count': len(data),
+                'cursor': next_cursor,
+                'has_more': len(changes) == limit,
+            }
+
+        except Exception as e:
+            _logger.error(f"Error fetching product delta: {str(e)}", exc_info=True)
+            return {
+                'success': False,
+                'error_code': 'SERVER_ERROR',
+                'message': str(e)
+            }
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """Copy the legacy requisition history into the shared state transition
+    log, which is now the only history store, and build the purchase price
+    index, which installs only get from the post_init_hook. Rows already
+    logged by the mixin for the same transition are skipped.
+    """
+    if not version:
+        return
+    cr.execute("""
+        WITH history AS (
+            SELECT h.*, r.company_id, r.department_id, r.create_date AS created,
+                   COALESCE(LAG(h.date) OVER (PARTITION BY h.requisition_id ORDER BY h.date, h.id),
+                            r.create_date) AS since
+              FROM purchase_requisition_history h
+              JOIN material_purchase_requisition r ON r.id = h.requisition_id
+        )
+        INSERT INTO state_transition_log
+               (res_model, res_id, from_state, to_state, date, user_id, company_id, department_id,
+                duration_days, elapsed_days, notes)
+        SELECT 'material.purchase.requisition', h.requisition_id, h.from_state, h.to_state, h.date, h.user_id,
+               h.company_id, h.department_id,
+               EXTRACT(EPOCH FROM h.date - h.since) / 86400.0,
+               EXTRACT(EPOCH FROM h.date - h.created) / 86400.0,
+               h.notes
+          FROM history h
+         WHERE NOT EXISTS (
+                SELECT 1
+                  FROM state_transition_log l
+                 WHERE l.res_model = 'material.purchase.requisition'
+                   AND l.res_id = h.requisition_id
+                   AND l.to_state = h.to_state
+                   AND date_trunc('second', l.date) = date_trunc('second', h.date)
+               )
+    """)
+    api.Environment(cr, SUPERUSER_ID, {})['purchase.price.history']._rebuild()
@@ -7,5 +7,8 @@ from . import hr_employee
 from . import hr_department
 from . import stock_picking
 from . import purchase_order
+from . import purchase_price_history
+from . import product_product
+from . import stock_warehouse
 
 
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+from odoo.tools.sql import create_index
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    def init(self):
+        super().init()
+        # Substring search on internal reference from the mobile catalogue.
+        # Added next to core's btree index on default_code, which still
+        # serves equality lookups and ordering.
+        if self.env.registry.has_trigram:
+            create_index(self.env.cr, 'product_product_default_code_trgm_idx', self._table,
+                         ['"default_code" gin_trgm_ops'], 'gin')
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields
+from odoo import api, models, fields
 
 class PurchaseOrder(models.Model):
     _inherit = 'purchase.order'
@@ -10,7 +10,36 @@ class PurchaseOrder(models.Model):
         string='Requisitions',
         copy=False,
         ondelete="set null",
+        index=True,
     )
+    rfq_mail_pending = fields.Boolean(
+        string='RFQ Mail Pending',
+        copy=False,
+        index=True,
+    )
+
+    def button_approve(self, force=False):
+        res = super().button_approve(force=force)
+        self.env['purchase.price.history'].sudo()._update_from_order_lines(
+            self.filtered(lambda o: o.state == 'purchase').order_line
+        )
+        return res
+
+    @api.model
+    def _cron_send_pending_rfq(self, batch_size=50):
+        """Render and send the RFQ documents queued by the RFQ wizard"""
+        orders = self.search([('rfq_mail_pending', '=', True)], limit=batch_size)
+        if not orders:
+            return
+        template = self.env.ref('purchase.email_template_edi_purchase', raise_if_not_found=False)
+        if template:
+            for order in orders:
+                template.send_mail(order.id)
+        orders.write({'rfq_mail_pending': False})
+        if len(orders) == batch_size:
+            self.env.ref(
+                'material_purchase_requisitions_dashboard.ir_cron_send_pending_rfq'
+            )._trigger()
 
 class PurchaseOrderLine(models.Model):
     _inherit = 'purchase.order.line'
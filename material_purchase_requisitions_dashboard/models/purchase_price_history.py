@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+# The average price is taken over this many most recent purchases
+ROLLING_PRICE_COUNT = 5
+
+
+class PurchasePriceHistory(models.Model):
+    _name = 'purchase.price.history'
+    _description = 'Purchase Price History'
+    _order = 'last_date desc, id desc'
+
+    product_id = fields.Many2one('product.product', string='Product', required=True, ondelete='cascade', index=True)
+    partner_id = fields.Many2one('res.partner', string='Vendor', required=True, ondelete='cascade')
+    uom_id = fields.Many2one('uom.uom', string='Unit of Measure', required=True, ondelete='cascade')
+    company_id = fields.Many2one('res.company', string='Company', required=True, ondelete='cascade')
+    currency_id = fields.Many2one(related='company_id.currency_id', string='Currency')
+    last_price = fields.Monetary(string='Last Price', currency_field='currency_id')
+    avg_price = fields.Monetary(string='Average Price', currency_field='currency_id',
+                                help='Average of the last purchase prices.')
+    min_price = fields.Monetary(string='Min Price', currency_field='currency_id')
+    max_price = fields.Monetary(string='Max Price', currency_field='currency_id')
+    purchase_count = fields.Integer(string='Purchases')
+    recent_prices = fields.Json(string='Recent Prices', readonly=True)
+    last_date = fields.Datetime(string='Last Purchase Date')
+
+    _product_partner_uom_company_uniq = models.Constraint(
+        'UNIQUE(product_id, partner_id, uom_id, company_id)',
+        'Only one price history entry per product, vendor, unit and company.',
+    )
+
+    @api.model
+    def _update_from_order_lines(self, lines):
+        """Fold confirmed purchase order lines into the index.
+
+        Existing entries for every touched key are loaded with one search and
+        updated with one UPDATE statement; missing keys are created in one
+        batch. The average price is the mean of the last
+        ``ROLLING_PRICE_COUNT`` purchase prices.
+        """
+        lines = lines.filtered(lambda l: l.product_id and l.product_uom_id and not l.display_type)
+        if not lines:
+            return
+        entries = self.search([
+            ('product_id', 'in', lines.product_id.ids),
+            ('partner_id', 'in', lines.order_id.partner_id.ids),
+            ('company_id', 'in', lines.order_id.company_id.ids),
+        ])
+        index = {
+            (e.product_id.id, e.partner_id.id, e.uom_id.id, e.company_id.id): e
+            for e in entries
+        }
+        values = {}
+        for line in lines.sorted(lambda l: l.order_id.date_approve or l.order_id.date_order):
+            order = line.order_id
+            company = order.company_id
+            date = order.date_approve or order.date_order or fields.Datetime.now()
+            price = order.currency_id._convert(
+                line.price_unit, company.currency_id, company, fields.Date.to_date(date)
+            )
+            key = (line.product_id.id, order.partner_id.id, line.product_uom_id.id, company.id)
+            vals = values.get(key)
+            if vals is None:
+                entry = index.get(key)
+                vals = values[key] = {
+                    'recent_prices': list(entry.recent_prices or []) if entry else [],
+                    'min_price': entry.min_price if entry else price,
+                    'max_price': entry.max_price if entry else price,
+                    'purchase_count': entry.purchase_count if entry else 0,
+                }
+            recent_prices = (vals['recent_prices'] + [price])[-ROLLING_PRICE_COUNT:]
+            vals.update({
+                'last_price': price,
+                'recent_prices': recent_prices,
+                'avg_price': sum(recent_prices) / len(recent_prices),
+                'min_price': min(vals['min_price'], price),
+                'max_price': max(vals['max_price'], price),
+                'purchase_count': vals['purchase_count'] + 1,
+                'last_date': date,
+            })
+
+        updates = [(index[key], vals) for key, vals in values.items() if key in index]
+        if updates:
+            self._write_entries(updates)
+        new_vals = [
+            {'product_id': key[0], 'partner_id': key[1], 'uom_id': key[2], 'company_id': key[3], **vals}
+            for key, vals in values.items() if key not in index
+        ]
+        if new_vals:
+            self.create(new_vals)
+
+    def _write_entries(self, updates):
+        """Write [(entry, vals)] with a single UPDATE ... FROM (VALUES ...)"""
+        self.flush_model()
+        self.env.cr.execute(SQL(
+            """
+            UPDATE purchase_price_history h
+               SET last_price = v.last_price,
+                   avg_price = v.avg_price,
+                   min_price = v.min_price,
+                   max_price = v.max_price,
+                   purchase_count = v.purchase_count,
+                   last_date = v.last_date,
+                   recent_prices = v.recent_prices,
+                   write_uid = %s,
+                   write_date = NOW() AT TIME ZONE 'UTC'
+              FROM (VALUES %s) AS v(id, last_price, avg_price, min_price, max_price,
+                                    purchase_count, last_date, recent_prices)
+             WHERE h.id = v.id
+            """,
+            self.env.uid,
+            SQL(', ').join(
+                SQL("(%s, %s::NUMERIC, %s::NUMERIC, %s::NUMERIC, %s::NUMERIC, %s, %s::TIMESTAMP, %s::JSONB)",
+                    entry.id, vals['last_price'], vals['avg_price'], vals['min_price'], vals['max_price'],
+                    vals['purchase_count'], vals['last_date'], json.dumps(vals['recent_prices']))
+                for entry, vals in updates
+            ),
+        ))
+        self.browse([entry.id for entry, vals in updates]).invalidate_recordset()
+
+    @api.model
+    def _get_price_map(self, products, partner=None, company=None):
+        """Return {(product_id, partner_id, uom_id): entry values} in one read.
+
+        Without a vendor, the most recent purchase of the product is also
+        available under the (product_id, False, uom_id) key.
+        """
+        company = company or self.env.company
+        domain = [('product_id', 'in', products.ids), ('company_id', '=', company.id)]
+        if partner:
+            domain.append(('partner_id', '=', partner.id))
+        price_map = {}
+        # Ordered by last_date desc, so the first hit per vendorless key is the latest
+        for row in self.search_read(domain, ['product_id', 'partner_id', 'uom_id', 'last_price',
+                                             'avg_price', 'min_price', 'max_price', 'last_date'], load=None):
+            price_map[(row['product_id'], row['partner_id'], row['uom_id'])] = row
+            price_map.setdefault((row['product_id'], False, row['uom_id']), row)
+        return price_map
+
+    @api.model
+    def _rebuild(self):
+        """Recompute the whole index from confirmed purchase order lines"""
+        self.search([]).unlink()
+        lines = self.env['purchase.order.line'].search([
+            ('order_id.state', 'in', ('purchase', 'done')),
+        ])
+        self._update_from_order_lines(lines)
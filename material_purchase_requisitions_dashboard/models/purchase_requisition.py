@@ -7,7 +7,8 @@ import logging
 class PurchaseOrder(models.Model):
     _name = 'material.purchase.requisition'
     _description = 'Material Purchase Requisition'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'state.transition.mixin']
+    _transition_department_field = 'department_id'
 
     name = fields.Char(string='Name', required=True, copy=False, readonly=True, default = lambda self: self.env['ir.sequence'].next_by_code('purchase.requisition.seq') or 'New')
     employee_id = fields.Many2one('hr.employee', string='Employee', required=True)
@@ -49,27 +50,28 @@ class PurchaseOrder(models.Model):
     reject_employee_id = fields.Many2one('res.users', string='Rejected By')
     reject_reason = fields.Text(string='Rejection Reason')
     
-    # History tracking
-    state_history_ids = fields.One2many('purchase.requisition.history', 'requisition_id', string='State History', readonly=True)
+    # History tracking, read from the shared state transition log
+    state_transition_ids = fields.Many2many('state.transition.log', string='State History',
+                                            compute='_compute_state_transition_ids')
+
+    def _compute_state_transition_ids(self):
+        logs = self.env['state.transition.log'].sudo().search([
+            ('res_model', '=', self._name), ('res_id', 'in', self.ids),
+        ])
+        logs_per_record = logs.grouped('res_id')
+        for rec in self:
+            rec.state_transition_ids = logs_per_record.get(rec.id, logs.browse())
 
     @api.model_create_multi
     def create(self, vals_list):
+        locations, companies = self.env['stock.warehouse']._get_requisition_warehouse_map()
         for vals in vals_list:
-            if not vals.get('picking_type_id'):
-                site_location = vals.get('site_location')
-                company_id = vals.get('company_id', self.env.company.id)
-
-                if site_location:
-                    # Get warehouse associated with the selected location
-                    warehouses = self.env['stock.warehouse'].search([('lot_stock_id', '=', site_location)])
-                    if warehouses:
-                        picking_types = self.env['stock.picking.type'].search([
-                            ('warehouse_id', '=', warehouses[0].id),
-                            ('code', '=', 'incoming')
-                        ], limit=1)
-                        if picking_types:
-                            vals['picking_type_id'] = picking_types.id
-                            vals['warehouse_id'] = warehouses[0].id
+            if not vals.get('picking_type_id') and vals.get('site_location'):
+                # Warehouse and incoming type of the selected location, from the cached map
+                warehouse_id, picking_type_id = locations.get(vals['site_location'], (False, False))
+                if picking_type_id:
+                    vals['picking_type_id'] = picking_type_id
+                    vals['warehouse_id'] = warehouse_id
 
         return super(PurchaseOrder, self).create(vals_list)
 
@@ -77,7 +79,8 @@ class PurchaseOrder(models.Model):
     
     @api.model
     def _default_picking_type_id(self):
-        picking_type = self.env['stock.picking.type'].search([('warehouse_id.company_id', '=', self.env.company.id), ('code', '=', 'incoming')], limit=1)
+        locations, companies = self.env['stock.warehouse']._get_requisition_warehouse_map()
+        picking_type = self.env['stock.picking.type'].browse(companies.get(self.env.company.id))
         if not picking_type:
             self.env['stock.warehouse']._warehouse_redirect_warning()
         return picking_type
@@ -86,32 +89,6 @@ class PurchaseOrder(models.Model):
     picking_type_id = fields.Many2one(
         'stock.picking.type', 'Operation Type', required=True, default=_default_picking_type_id)
     
-    def _track_state_change(self, new_state, notes=None, from_state=None):
-        """Track state changes in history"""
-        state_labels = {
-            'draft': 'Draft',
-            'dept_confirm': 'Department Confirmed',
-            'budget_check': 'Budget Check',
-            'ir_approve': 'Waiting Approval',
-            'procurement_review': 'Procurement Review',
-            'approve': 'Approved',
-            'rfq_creation': 'RFQ Creation',
-            'comparison': 'Comparison',
-            'po_confirm': 'PO Confirmed',
-            'cancel': 'Cancelled',
-            'reject': 'Rejected',
-        }
-        
-        self.env['purchase.requisition.history'].create({
-            'requisition_id': self.id,
-            'from_state': from_state or self.state,
-            'to_state': new_state,
-            'state_label': state_labels.get(new_state, new_state),
-            'user_id': self.env.user.id,
-            'notes': notes,
-            'ip_address': self.env.context.get('request_ip') if self.env.context.get('request_ip') else '127.0.0.1'
-        })
-
     @api.onchange('site_location')
     def _onchange_site_location(self):
         """Reset picking_type_id when location changes and update domain"""
@@ -119,9 +96,9 @@ class PurchaseOrder(models.Model):
             # Clear the current picking type to force re-selection with new domain
             self.picking_type_id = False
             # Update warehouse based on selected location
-            warehouses = self.env['stock.warehouse'].search([('lot_stock_id', '=', self.site_location.id)])
-            if warehouses:
-                self.warehouse_id = warehouses[0]
+            warehouse_id = self._get_site_location_warehouse_id()
+            if warehouse_id:
+                self.warehouse_id = warehouse_id
         else:
             self.warehouse_id = False
             self.picking_type_id = False
@@ -144,14 +121,19 @@ class PurchaseOrder(models.Model):
             }
         }
     
+    def _get_site_location_warehouse_id(self):
+        """Warehouse whose stock location is the site location, from the cached map"""
+        locations, companies = self.env['stock.warehouse']._get_requisition_warehouse_map()
+        return locations.get(self.site_location._origin.id, (False, False))[0]
+
     def _get_picking_type_domain(self):
         """Get domain for picking types based on selected location"""
         domain = []
         if self.site_location:
             # Get warehouse associated with the selected location
-            warehouses = self.env['stock.warehouse'].search([('lot_stock_id', '=', self.site_location.id)])
-            if warehouses:
-                domain = [('warehouse_id', '=', warehouses[0].id)]
+            warehouse_id = self._get_site_location_warehouse_id()
+            if warehouse_id:
+                domain = [('warehouse_id', '=', warehouse_id)]
             else:
                 # If no direct warehouse found, get warehouses in the same company
                 domain = [('warehouse_id.company_id', '=', self.company_id.id)]
@@ -162,41 +144,31 @@ class PurchaseOrder(models.Model):
 
 
     def requisition_confirm(self):
-        old_state = self.state
-        self.write({'state': 'dept_confirm'})
-        self._track_state_change('dept_confirm', 'Requisition confirmed by employee', old_state)
+        self.with_context(state_transition_note=_('Requisition confirmed by employee')).write({'state': 'dept_confirm'})
 
     def budget_approve(self):
-        old_state = self.state
-        self.write({
+        self.with_context(state_transition_note=_('Budget approved')).write({
             'state': 'dept_confirm',
             'employee_confirm_id': self.env.user.id,
             'confirm_date': fields.Datetime.now(),
         })
-        self._track_state_change('dept_confirm', 'Budget approved', old_state)
 
     def manager_approve(self):
-        old_state = self.state
-        self.write({
+        self.with_context(state_transition_note=_('Department approved by manager')).write({
             'state': 'ir_approve',
             'approve_manager_id': self.env.user.id,
             'managerapp_date': fields.Datetime.now(),
         })
-        self._track_state_change('ir_approve', 'Department approved by manager', old_state)
 
     def procurement_review(self):
-        old_state = self.state
-        self.write({'state': 'procurement_review'})
-        self._track_state_change('procurement_review', 'Moved to procurement review', old_state)
+        self.with_context(state_transition_note=_('Moved to procurement review')).write({'state': 'procurement_review'})
 
     def user_approve(self):
-        old_state = self.state
-        self.write({
+        self.with_context(state_transition_note=_('Approved by procurement user')).write({
             'state': 'rfq_creation',
             'approve_employee_id': self.env.user.id,
             'userrapp_date': fields.Datetime.now(),
         })
-        self._track_state_change('rfq_creation', 'Approved by procurement user', old_state)
 
     def create_rfqs(self):
         return {
@@ -209,9 +181,7 @@ class PurchaseOrder(models.Model):
         }
 
     def action_po_confirm(self):
-        old_state = self.state
-        self.write({'state': 'po_confirm'})
-        self._track_state_change('po_confirm', 'PO Confirmed', old_state)
+        self.with_context(state_transition_note=_('PO Confirmed')).write({'state': 'po_confirm'})
 
     def requisition_reject(self):
         # Show dialog to capture rejection reason
@@ -226,24 +196,18 @@ class PurchaseOrder(models.Model):
     
     def reject_with_reason(self, reason):
         """Reject requisition with reason"""
-        old_state = self.state
-        self.write({
+        self.with_context(state_transition_note=_('Rejected: %s', reason)).write({
             'state': 'reject',
             'reject_employee_id': self.env.user.id,
             'reject_reason': reason,
             'userreject_date': fields.Datetime.now(),
         })
-        self._track_state_change('reject', f'Rejected: {reason}', old_state)
 
     def action_cancel(self):
-        old_state = self.state
-        self.write({'state': 'cancel'})
-        self._track_state_change('cancel', 'Requisition cancelled', old_state)
+        self.with_context(state_transition_note=_('Requisition cancelled')).write({'state': 'cancel'})
 
     def reset_draft(self):
-        old_state = self.state
-        self.write({'state': 'draft'})
-        self._track_state_change('draft', 'Reset to draft', old_state)
+        self.with_context(state_transition_note=_('Reset to draft')).write({'state': 'draft'})
 
 
     def action_show_po(self):
@@ -260,10 +224,9 @@ class PurchaseOrder(models.Model):
         return {
             'type': 'ir.actions.act_window',
             'name': 'State History',
-            'res_model': 'purchase.requisition.history',
-            'view_mode': 'list,form',
-            'domain': [('requisition_id', '=', self.id)],
-            'context': {'default_requisition_id': self.id},
+            'res_model': 'state.transition.log',
+            'view_mode': 'list',
+            'domain': [('res_model', '=', self._name), ('res_id', '=', self.id)],
         }
 
     @api.model
@@ -308,6 +271,9 @@ class PurchaseOrder(models.Model):
         
         # Filter out products that don't have valid lines
         product_ids = product_ids.filtered(lambda p: p.exists())
+        price_map = self.env['purchase.price.history']._get_price_map(
+            product_ids, company=tendor_id.company_id or self.env.company
+        )
         
         for purchase_id in purchase_ids:
             min_price_total.append(sum(purchase_id.order_line.mapped('price_unit')))
@@ -447,6 +413,7 @@ class PurchaseOrder(models.Model):
 
             # Only add record if we have valid vendors
             if min_date_vendor and min_prize_vendor:
+                history = price_map.get((product_id.id, False, product_id.uom_id.id))
                 min_date_po = self.env['purchase.order'].search([
                     ('partner_id', '=', min_date_vendor.id), 
                     ('material_purchase_requisition_id', '=', tendor_id.id)
@@ -465,6 +432,8 @@ class PurchaseOrder(models.Model):
                     'min_prize': min_prize,
                     'min_prize_vendor': f"{min_prize_vendor.name} - {min_prize_po.name if min_prize_po.exists() else 'Unknown'}",
                     'message': ("Vendor Name: " + min_prize_vendor.name + " ,Min Prize: " + str(min_prize)),
+                    'last_price': history['last_price'] if history else 0.0,
+                    'avg_price': history['avg_price'] if history else 0.0,
                     'record_lines': lines,
                 })
 
@@ -636,11 +605,14 @@ class PurchaseOrder(models.Model):
 
 
 class PurchaseRequisitionHistory(models.Model):
+    """Legacy per-requisition history, copied into state.transition.log by
+    the 19.0.1.0.1 migration and no longer written to.
+    """
     _name = 'purchase.requisition.history'
-    _description = 'Purchase Requisition State History'
+    _description = 'Purchase Requisition State History (Legacy)'
     _order = 'date desc, id desc'
     
-    requisition_id = fields.Many2one('material.purchase.requisition', string='Requisition', required=True, ondelete='cascade')
+    requisition_id = fields.Many2one('material.purchase.requisition', string='Requisition', required=True, ondelete='cascade', index=True)
     from_state = fields.Char(string='From State')
     to_state = fields.Char(string='To State', required=True)
     state_label = fields.Char(string='State Label', required=True)
@@ -30,9 +30,16 @@ class MaterialPurchaseRequisitionLine(models.Model):
         string='Unit of Measure',
         required=True,
     )
+    price_unit = fields.Float(
+        string='Estimated Unit Price',
+        digits='Product Price',
+    )
     @api.onchange('product_id')
     def onchange_product_id(self):
+        price_map = self.env['purchase.price.history']._get_price_map(self.product_id)
         for rec in self:
             rec.description = rec.product_id.name
             rec.uom = rec.product_id.uom_id.id
+            history = price_map.get((rec.product_id.id, False, rec.uom.id))
+            rec.price_unit = history['last_price'] if history else 0.0
 
@@ -16,11 +16,20 @@ class RFQWizard(models.TransientModel):
         req_id = self.env.context.get('default_requisition_id')
         if req_id:
             requisition = self.env['material.purchase.requisition'].browse(req_id)
+            req_lines = requisition.requisition_line_ids
+            # Default prices from the price history index, one read for all lines
+            price_map = self.env['purchase.price.history']._get_price_map(
+                req_lines.product_id, company=requisition.company_id or self.env.company
+            )
             lines = []
-            for line in requisition.requisition_line_ids:
+            for line in req_lines:
+                history = price_map.get((line.product_id.id, False, line.uom.id)) or \
+                    price_map.get((line.product_id.id, False, line.product_id.uom_id.id))
                 lines.append((0, 0, {
                     'product_id': line.product_id.id,
                     'qty': line.qty,
+                    'price_unit': line.price_unit or (history and history['last_price']) or 0.0,
+                    'requisition_line_id': line.id,
                 }))
             res['line_ids'] = lines
         return res
@@ -55,6 +64,11 @@ class RFQWizard(models.TransientModel):
         string='Products'
     )
 
+    send_by_email = fields.Boolean(
+        string='Send RFQ by Email',
+        help='Email the RFQ document to each vendor in the background.'
+    )
+
 
     # ---------------------------------------------
     # BEHAVIOR: reset vendor fields based on rfq type
@@ -138,49 +152,65 @@ class RFQWizard(models.TransientModel):
             raise UserError("No products with valid prices to create RFQ.")
 
         # ---------------- PREVENT DUPLICATES ----------------
-        existing_vendors = self.env['purchase.order'].search([
-            ('material_purchase_requisition_id', '=', requisition.id)
-        ]).mapped('partner_id')
-
-        for vendor in partners:
-            if vendor in existing_vendors:
-                raise UserError(
-                    f"RFQ already exists for vendor: {vendor.name}. "
-                    "Remove existing PO before sending again."
-                )
+        # One grouped query over the requisition's POs instead of loading them all
+        existing = self.env['purchase.order']._read_group(
+            [
+                ('material_purchase_requisition_id', '=', requisition.id),
+                ('partner_id', 'in', partners.ids),
+            ],
+            groupby=['partner_id'],
+            aggregates=['__count'],
+        )
+        if existing:
+            vendor = existing[0][0]
+            raise UserError(
+                f"RFQ already exists for vendor: {vendor.name}. "
+                "Remove existing PO before sending again."
+            )
 
         # ---------------- CREATE THE RFQs ----------------
-        PurchaseOrder = self.env['purchase.order']
-
-        for vendor in partners:
-            po_vals = {
-                'partner_id': vendor.id,
-                'material_purchase_requisition_id': requisition.id,
-                # 'requisition_id': False,
-                'company_id': self.env.company.id,
-                'currency_id': vendor.property_purchase_currency_id.id or self.env.company.currency_id.id,
-                'date_order': fields.Datetime.now(),
-                'project_id' : self.requisition_id.project_id.id,
-                'order_line': [
-                    (0, 0, {
-                        'product_id': line.product_id.id,
-                        'name': line.product_id.display_name or line.product_id.name or 'Product',
-                        'product_uom_id': line.product_id.uom_id.id,
-                        'product_qty': line.qty,
-                        'price_unit': line.price_unit,
-                        'date_planned': fields.Datetime.now(),
-                    })
-                    for line in lines_to_use if line.product_id
-                ],
-            }
-
-            # Wrap in try block to expose real error if any
-            try:
-                po = PurchaseOrder.create(po_vals)
-                # Auto-send the RFQ by changing state to sent
-                po.write({'state': 'sent'})
-            except Exception as e:
-                raise UserError(f"PO Creation Failed: {str(e)}")
+        # Prefetch everything read per vendor / per line in one go
+        partners.fetch(['name', 'property_purchase_currency_id'])
+        products = lines_to_use.product_id
+        products.fetch(['display_name', 'name', 'uom_id'])
+
+        now = fields.Datetime.now()
+        order_lines = [
+            (0, 0, {
+                'product_id': line.product_id.id,
+                'name': line.product_id.display_name or line.product_id.name or 'Product',
+                'product_uom_id': line.product_id.uom_id.id,
+                'product_qty': line.qty,
+                'price_unit': line.price_unit,
+                'date_planned': now,
+            })
+            for line in lines_to_use if line.product_id
+        ]
+        company = self.env.company
+        vals_list = [{
+            'partner_id': vendor.id,
+            'material_purchase_requisition_id': requisition.id,
+            'company_id': company.id,
+            'currency_id': vendor.property_purchase_currency_id.id or company.currency_id.id,
+            'date_order': now,
+            'project_id': requisition.project_id.id,
+            # RFQs are sent on creation, no follow-up write needed
+            'state': 'sent',
+            'order_line': order_lines,
+        } for vendor in partners]
+
+        # Wrap in try block to expose real error if any
+        try:
+            orders = self.env['purchase.order'].create(vals_list)
+        except Exception as e:
+            raise UserError(f"PO Creation Failed: {str(e)}")
+
+        if self.send_by_email:
+            # Rendering and mailing one document per vendor is slow, leave it to the cron
+            orders.write({'rfq_mail_pending': True})
+            self.env.ref(
+                'material_purchase_requisitions_dashboard.ir_cron_send_pending_rfq'
+            )._trigger()
 
         # ---------------- UPDATE REQUISITION STATE ----------------
         requisition.write({'state': 'comparison'})
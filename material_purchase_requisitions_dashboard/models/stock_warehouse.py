@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models, tools
+
+# Warehouse fields read by _get_requisition_warehouse_map
+REQUISITION_WAREHOUSE_FIELDS = {'lot_stock_id', 'active'}
+
+
+class StockWarehouse(models.Model):
+    _inherit = 'stock.warehouse'
+
+    @api.model
+    @tools.ormcache()
+    def _get_requisition_warehouse_map(self):
+        """Return ``(locations, companies)``, cached in the registry:
+
+        - locations: {stock location id: (warehouse id, incoming picking type id or False)}
+        - companies: {company id: first incoming picking type id of its warehouses}
+
+        The result must not be mutated; it is invalidated on any warehouse
+        create or unlink, on a write of the fields it reads, and on any
+        picking type change below.
+        """
+        incoming = {}
+        companies = {}
+        for picking_type in self.env['stock.picking.type'].sudo().search_read(
+                [('code', '=', 'incoming'), ('warehouse_id', '!=', False)],
+                ['warehouse_id', 'company_id'], load=None):
+            incoming.setdefault(picking_type['warehouse_id'], picking_type['id'])
+            companies.setdefault(picking_type['company_id'], picking_type['id'])
+        locations = {}
+        for warehouse in self.sudo().search_read([], ['lot_stock_id'], load=None):
+            locations.setdefault(warehouse['lot_stock_id'], (warehouse['id'], incoming.get(warehouse['id'], False)))
+        return locations, companies
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.env.registry.clear_cache()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if REQUISITION_WAREHOUSE_FIELDS.intersection(vals):
+            self.env.registry.clear_cache()
+        return super().write(vals)
+
+    def unlink(self):
+        self.env.registry.clear_cache()
+        return super().unlink()
+
+
+class StockPickingType(models.Model):
+    _inherit = 'stock.picking.type'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.env.registry.clear_cache()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        self.env.registry.clear_cache()
+        return super().write(vals)
+
+    def unlink(self):
+        self.env.registry.clear_cache()
+        return super().unlink()
@@ -1,4 +1,8 @@
 # -*-coding- utf8-*-
 
 from . import models
-# from . import reports
\ No newline at end of file
+from . import reports
+
+
+def _post_init_refresh_committed_costs(env):
+    env['budget.committed.cost']._refresh()
\ No newline at end of file
@@ -2,7 +2,7 @@
 
 {
     'name': 'RCL Project Task Budget',
-    'version': '19.0.1.0',
+    'version': '19.0.1.1',
     'category': 'Project',
     'depends': ['base', 'project', 'account_budget', 'project_account_budget', 'project_purchase', 'analytic','purchase','stock','construction_dpr'],
     'data': [
@@ -20,6 +20,7 @@
                 'project_task_budget/static/src/components/**/*',
             ],
         },
+    'post_init_hook': '_post_init_refresh_committed_costs',
     'license': 'LGPL-3',
     'installable': True,
     'application': False,
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """Fill the committed cost table on databases upgraded from a version
+    without it; new installs get it from the post_init_hook.
+    """
+    if not version:
+        return
+    api.Environment(cr, SUPERUSER_ID, {})['budget.committed.cost']._refresh()
@@ -4,4 +4,5 @@ from . import project
 from . import budget_line
 from . import purchase_order
 from . import purchase_order_line
-from . import rate_analysis
\ No newline at end of file
+from . import rate_analysis
+from . import account_move
@@ -0,0 +1,14 @@
+from odoo import models
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'state' in vals:
+            # Posting, resetting or cancelling a bill changes what is still committed
+            purchase_lines = self.line_ids.purchase_line_id
+            if purchase_lines:
+                self.env['budget.committed.cost'].sudo()._refresh(purchase_lines)
+        return res
@@ -1,51 +1,59 @@
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class BudgetLine(models.Model):
     _inherit = 'budget.line'
 
-    def action_open_budget_entries(self):
-        project_plan, other_plans = self.env['account.analytic.plan']._get_all_plans()
-        all_plan = project_plan + other_plans
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        lines._link_project_budget_lines()
+        return lines
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'account_id' in vals:
+            self._link_project_budget_lines()
+        return res
+
+    def _link_project_budget_lines(self):
+        """Attach lines to projects of the same analytic account that have none yet"""
+        lines = self.filtered('account_id')
+        if not lines:
+            return
+        projects = self.env['project.project'].search([
+            ('account_id', 'in', lines.account_id.ids),
+            ('project_budget_line_id', '=', False),
+        ])
+        for project in projects:
+            project.project_budget_line_id = lines.filtered(lambda l: l.account_id == project.account_id)[:1]
 
-        project = self.env['project.project'].search([('account_id', '=', self.account_id.id)])
+    def action_open_budget_entries(self):
+        project = self.env['project.project'].search([('account_id', '=', self.account_id.id)], limit=1)
         budget_analytic_lines = [self.id]
         budget_analytic_ids = [self.budget_analytic_id.id]
         account_ids = False
-        task = self.env['project.task'].search([('analytic_account_id', '=', self.account_id.id)])
+        task = self.env['project.task'].search([('analytic_account_id', '=', self.account_id.id)], limit=1)
+        # Whole project or task subtree (e.g. village -> person) from parent_path in one query
         if project:
-            project_tasks = project.task_ids
             account_ids = [project.account_id.id]
-
-            for task in project_tasks:
-                if task.is_create_budget:
-                    if task.analytic_account_id:
-                        account_ids.append(task.analytic_account_id.id)
-
-                    child_account_ids = task.child_ids.filtered(lambda l: l.is_create_budget).mapped(
-                        'analytic_account_id.id')
-                    account_ids.extend(child_account_ids)
-                    account_ids = list(set(account_ids))
-
-            budget_analytic_lines = self.env['budget.line'].search([('account_id', 'in', account_ids)])
-            budget_analytic_ids = budget_analytic_lines and budget_analytic_lines.mapped('budget_analytic_id.id') or [self.budget_analytic_id.id]
-            budget_analytic_lines = budget_analytic_lines and budget_analytic_lines.mapped('id') or [self.id]
+            account_ids.extend(project.task_ids.filtered('is_create_budget')._get_budget_subtree_accounts())
         elif task and task.is_create_budget and task.analytic_account_id:
-            account_ids = [task.analytic_account_id.id]
-            child_account_ids = task.child_ids.filtered(lambda l: l.is_create_budget).mapped(
-                'analytic_account_id.id')
-            account_ids.extend(child_account_ids)
-            budget_analytic_lines = self.env['budget.line'].search([('account_id', 'in', account_ids)])
-            budget_analytic_ids = budget_analytic_lines and budget_analytic_lines.mapped('budget_analytic_id.id') or [
-                self.budget_analytic_id.id]
-            budget_analytic_lines = budget_analytic_lines and budget_analytic_lines.mapped('id') or [self.id]
+            account_ids = list(task._get_budget_subtree_accounts())
+        if account_ids:
+            account_ids = list(set(account_ids))
+            budget_lines = self.env['budget.line'].search_read([('account_id', 'in', account_ids)],
+                                                               ['budget_analytic_id'], load=None)
+            if budget_lines:
+                budget_analytic_ids = list({line['budget_analytic_id'] for line in budget_lines})
+                budget_analytic_lines = [line['id'] for line in budget_lines]
         domain = [('budget_analytic_id', 'in', budget_analytic_ids), ('budget_line_id', 'in', budget_analytic_lines)]
 
-        for plan in all_plan:
+        project_plan, other_plans = self.env['account.analytic.plan']._get_all_plans()
+        for plan in project_plan + other_plans:
             fname = plan._column_name()
-            account_ids = account_ids and account_ids or self[fname].ids
             if self[fname]:
-                domain += [(fname, 'in', account_ids)]
+                domain += [(fname, 'in', account_ids or self[fname].ids)]
         action = self.env['ir.actions.act_window']._for_xml_id('account_budget.budget_report_action')
         action['domain'] = domain
-        return action
\ No newline at end of file
+        return action
@@ -1,6 +1,7 @@
 import json
 from collections import defaultdict
 from odoo import fields, models, api, _
+from odoo.tools import SQL
 from datetime import datetime
 
 
@@ -24,12 +25,52 @@ class Project(models.Model):
         string='Rate Analysis Count',
         compute='_compute_rate_analysis_count'
     )
+    # Budget ledger: maintained aggregates for task budget overrun checks
+    project_budget_line_id = fields.Many2one(
+        'budget.line',
+        string='Project Budget Line',
+        compute='_compute_project_budget_line_id',
+        store=True,
+        readonly=False,
+        index=True,
+    )
+    project_budget_limit = fields.Float(
+        string='Project Budget Limit',
+        related='project_budget_line_id.budget_amount',
+        store=True,
+    )
+    task_budget_allocated = fields.Float(
+        string='Allocated to Tasks',
+        compute='_compute_task_budget_allocated',
+        store=True,
+    )
+
+    @api.depends('account_id')
+    def _compute_project_budget_line_id(self):
+        lines_per_account = {}
+        for line in self.env['budget.line'].search([('account_id', 'in', self.account_id.ids)]):
+            lines_per_account.setdefault(line.account_id.id, line)
+        for project in self:
+            project.project_budget_line_id = lines_per_account.get(project.account_id.id, False)
+
+    @api.depends('task_ids.budget_amount')
+    def _compute_task_budget_allocated(self):
+        allocated = {
+            project.id: amount
+            for project, amount in self.env['project.task']._read_group(
+                [('project_id', 'in', self.ids)], ['project_id'], ['budget_amount:sum'])
+        }
+        for project in self:
+            project.task_budget_allocated = allocated.get(project.id, 0.0)
 
     def _compute_rate_analysis_count(self):
+        counts = {
+            project.id: count
+            for project, count in self.env['rate.analysis']._read_group(
+                [('project_id', 'in', self.ids)], ['project_id'], ['__count'])
+        }
         for project in self:
-            project.rate_analysis_count = self.env['rate.analysis'].search_count([
-                ('project_id', '=', project.id)
-            ])
+            project.rate_analysis_count = counts.get(project.id, 0)
 
     def action_view_rate_analysis(self):
         self.ensure_one()
@@ -187,7 +228,7 @@ class Project(models.Model):
 
                 if account_id:
                     project_account_id = account_id.id
-                self.env['budget.line'].create({
+                project_budget_line = self.env['budget.line'].create({
                     'budget_analytic_id': budget_analytic_id and budget_analytic_id.id or False,
                     'account_id': project_account_id or False,
                     'budget_amount': rec.budget_amount,
@@ -198,6 +239,7 @@ class Project(models.Model):
                     'account_id': project_account_id,
                     'budget_analytic_id': budget_analytic_id.id,
                     'company_id': self.env.company.id,
+                    'project_budget_line_id': project_budget_line.id,
                 })
                 # dpr_project.write({
                 #     'company_id' : rec.company_id.id,
@@ -227,23 +269,8 @@ class Project(models.Model):
         self.ensure_one()
         if not self.account_id:
             return
-        project_tasks = self.task_ids
         account_ids = [self.account_id.id]
-
-        def collect_task_and_subtask_accounts(task):
-            task_accounts = []
-            if task.is_create_budget and task.analytic_account_id:
-                task_accounts.append(task.analytic_account_id.id)
-
-            for child_task in task.child_ids:
-                task_accounts.extend(collect_task_and_subtask_accounts(child_task))
-
-            return task_accounts
-
-        for task in project_tasks:
-            task_account_ids = collect_task_and_subtask_accounts(task)
-            account_ids.extend(task_account_ids)
-
+        account_ids.extend(self.task_ids._get_budget_subtree_accounts())
         account_ids = list(set(account_ids))
 
         budget_lines = self.env['budget.line'].sudo()._read_group(
@@ -253,7 +280,7 @@ class Project(models.Model):
                 ('budget_analytic_id.state', 'in', ['confirmed', 'done']),
             ],
             ['budget_analytic_id', 'company_id'],
-            ['budget_amount:sum', 'achieved_amount:sum', 'id:array_agg'],
+            ['budget_amount:sum', 'achieved_amount:sum', 'id:array_agg', 'account_id:array_agg'],
         )
 
         has_company_access = False
@@ -277,35 +304,42 @@ class Project(models.Model):
             }
         )
 
-        budget_line = self.env['budget.line']
         project_budget_id = self.env['budget.line'].search([('account_id', '=', self.account_id.id)]) or False
+        total = project_budget_id and sum(project_budget_id.mapped('budget_amount')) or 0
+
+        # Resolve every budget line account to its project / task once per call
+        line_account_ids = list({
+            account_id
+            for *dummy, line_accounts in budget_lines
+            for account_id in line_accounts if account_id
+        })
+        project_account_ids = {
+            project['account_id'] for project in self.env['project.project'].search_read(
+                [('account_id', 'in', line_account_ids)], ['account_id'], load=None)
+        }
+        task_per_account = {}
+        for task in self.env['project.task'].search_read(
+                [('analytic_account_id', 'in', line_account_ids)], ['analytic_account_id', 'parent_id'],
+                order='id', load=None):
+            task_per_account.setdefault(task['analytic_account_id'], task)
+
+        for budget_analytic, dummy, allocated, spent, ids, line_accounts in budget_lines:
+            account_id = line_accounts and line_accounts[0] or False
+            is_project = account_id in project_account_ids
+            task = task_per_account.get(account_id)
+            is_task = bool(task and not task['parent_id'])
+            is_subtask = bool(task and task['parent_id'])
 
-        for budget_analytic, dummy, allocated, spent, ids in budget_lines:
-            budget_line_id = budget_line.browse(ids)
-            account_id = budget_line_id and budget_line_id.account_id.id or False
-            project_id = self.env['project.project'].search([('account_id', '=', account_id)]) or False
-
-            task_id = self.env['project.task'].search([('analytic_account_id', '=', account_id)], limit=1) or False
-            is_task = False
-            is_subtask = False
-
-            if task_id:
-                if task_id.parent_id:
-                    is_subtask = True
-                else:
-                    is_task = True
-
-            total = project_budget_id and sum(project_budget_id.mapped('budget_amount')) or 0
             budget_data = budget_data_per_budget[budget_analytic]
             budget_data['id'] = budget_analytic.id
             budget_data['name'] = budget_analytic.display_name
-            budget_data['is_project'] = project_id and True or False
+            budget_data['is_project'] = is_project
             budget_data['is_task'] = is_task
             budget_data['is_subtask'] = is_subtask
             budget_data['allocated'] += allocated
             budget_data['spent'] += spent
             total_allocated = total
-            total_spent += spent if not project_id else 0
+            total_spent += spent if not is_project else 0
             # total_allocated += allocated
             # total_spent += spent
 
@@ -352,47 +386,68 @@ class Project(models.Model):
             budget_items['company_id'] = self.company_id.id or self.env.company.id
         return budget_items
 
+    def _get_task_budget_invoice_groups(self, account_ids):
+        """Purchase invoice lines distributed on the given analytic accounts,
+        aggregated per (state, currency, date) in one query.
+
+        Returns ``(parent_state, currency_id, date, amount, line ids,
+        purchase line ids)`` rows where ``amount`` is the signed subtotal
+        share of the exactly matching distribution keys.
+        """
+        if not account_ids:
+            return []
+        self.env['account.move.line'].flush_model([
+            'parent_state', 'currency_id', 'date', 'price_subtotal', 'analytic_distribution',
+            'purchase_line_id', 'move_id',
+        ])
+        self.env['account.move'].flush_model(['move_type'])
+        account_keys = [str(account_id) for account_id in account_ids]
+        self.env.cr.execute(SQL("""
+            SELECT aml.parent_state,
+                   aml.currency_id,
+                   aml.date,
+                   SUM(
+                       CASE WHEN a.key = ANY(%(keys)s) THEN aml.price_subtotal * a.value::FLOAT / 100 ELSE 0 END
+                       * CASE WHEN am.move_type IN ('in_refund', 'out_refund') THEN -1 ELSE 1 END
+                   ) AS amount,
+                   ARRAY_AGG(DISTINCT aml.id) AS line_ids,
+                   ARRAY_AGG(DISTINCT aml.purchase_line_id) AS purchase_line_ids
+              FROM account_move_line aml
+              JOIN account_move am ON am.id = aml.move_id
+        CROSS JOIN LATERAL jsonb_each(aml.analytic_distribution) AS a(key, value)
+             WHERE aml.parent_state IN ('draft', 'posted')
+               AND aml.purchase_line_id IS NOT NULL
+               AND string_to_array(a.key, ',') && %(keys)s
+          GROUP BY aml.parent_state, aml.currency_id, aml.date
+        """, keys=account_keys))
+        return self.env.cr.fetchall()
+
     def _get_profitability_items(self, with_action=True):
         profitability_items = super()._get_profitability_items(with_action)
-        project_tasks = self.task_ids
-        account_ids = []
-
-        for task in project_tasks:
-            if task.is_create_budget:
-                if task.analytic_account_id:
-                    account_ids.append(task.analytic_account_id.id)
-
-                child_account_ids = task.child_ids.filtered(lambda l: l.is_create_budget).mapped(
-                    'analytic_account_id.id')
-                account_ids.extend(child_account_ids)
-        target_accounts = account_ids and {str(account_id) for account_id in account_ids} or {}
+        account_ids = list(self.task_ids.filtered('is_create_budget')._get_budget_subtree_accounts())
         if self.account_id or account_ids:
-            invoice_lines = self.env['account.move.line'].sudo().search_fetch([
-                ('parent_state', 'in', ['draft', 'posted']),
-                ('analytic_distribution', 'in', account_ids),
-                ('purchase_line_id', '!=', False),
-            ], ['parent_state', 'currency_id', 'price_subtotal', 'analytic_distribution'])
             purchase_order_line_invoice_line_ids = self._get_already_included_profitability_invoice_line_ids()
             with_action = with_action and (
                     self.env.user.has_group('purchase.group_purchase_user')
                     or self.env.user.has_group('account.group_account_invoice')
                     or self.env.user.has_group('account.group_account_readonly')
             )
-            if invoice_lines:
+            invoice_groups = self._get_task_budget_invoice_groups(account_ids)
+            if invoice_groups:
                 amount_invoiced = amount_to_invoice = 0.0
-                purchase_order_line_invoice_line_ids.extend(invoice_lines.ids)
-                for line in invoice_lines:
-                    analytic_dist = line.analytic_distribution or {}
-                    matched_keys = set(analytic_dist.keys()) & target_accounts
-
-                    if not matched_keys:
+                purchase_line_ids = set()
+                rates = {}
+                for parent_state, currency_id, date, amount, line_ids, pol_ids in invoice_groups:
+                    purchase_order_line_invoice_line_ids.extend(line_ids)
+                    purchase_line_ids.update(pol_ids)
+                    if not amount:
                         continue
-
-                    analytic_contribution = sum(analytic_dist[k] for k in matched_keys) / 100.0
-
-                    price_subtotal = line.currency_id._convert(line.price_subtotal, self.currency_id, self.company_id)
-                    cost = price_subtotal * analytic_contribution * (-1 if line.is_refund else 1)
-                    if line.parent_state == 'posted':
+                    if (currency_id, date) not in rates:
+                        rates[currency_id, date] = self.env['res.currency']._get_conversion_rate(
+                            self.env['res.currency'].browse(currency_id), self.currency_id, self.company_id, date,
+                        )
+                    cost = self.currency_id.round(amount * rates[currency_id, date])
+                    if parent_state == 'posted':
                         amount_invoiced -= cost
                     else:
                         amount_to_invoice -= cost
@@ -404,9 +459,10 @@ class Project(models.Model):
                                         'sequence': self._get_profitability_sequence_per_invoice_type()[section_id],
                                         'billed': amount_invoiced, 'to_bill': amount_to_invoice}
                 if with_action:
-                    args = [section_id, [('id', 'in', invoice_lines.purchase_line_id.ids)]]
-                    if len(invoice_lines.purchase_line_id) == 1:
-                        args.append(invoice_lines.purchase_line_id.id)
+                    purchase_line_ids = sorted(purchase_line_ids)
+                    args = [section_id, [('id', 'in', purchase_line_ids)]]
+                    if len(purchase_line_ids) == 1:
+                        args.append(purchase_line_ids[0])
                     action = {'name': 'action_profitability_items', 'type': 'object', 'args': json.dumps(args)}
                     purchase_order_costs['action'] = action
                 existing = next((i for i in costs['data'] if i['id'] == section_id), None)
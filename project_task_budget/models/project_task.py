@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
 import logging
 
@@ -9,6 +9,15 @@ CLOSED_STATES = {
 }
 _logger = logging.getLogger(__name__)
 
+# Changing any of these reshapes the budget account hierarchy
+BUDGET_HIERARCHY_FIELDS = {'parent_id', 'is_create_budget', 'analytic_account_id'}
+# Changing any of these reshapes the per-project budget account sets
+PROJECT_BUDGET_FIELDS = {'project_id', 'is_create_budget', 'analytic_account_id'}
+# Transaction-scoped memo of {project id: budget task account ids}, see _get_project_budget_account_ids
+PROJECT_BUDGET_ACCOUNTS_KEY = 'project_task_budget.project_budget_accounts'
+# Transaction-scoped ancestry map once the hierarchy changed, see _get_budget_account_ancestors
+BUDGET_ANCESTORS_KEY = 'project_task_budget.budget_account_ancestors'
+
 
 class ProjectTask(models.Model):
     _inherit = "project.task"
@@ -36,7 +45,8 @@ class ProjectTask(models.Model):
     is_create_budget = fields.Boolean("Want to Create Budget??")
     unit_id = fields.Many2one('uom.uom', string='Unit')
     quantity = fields.Float(string='Quantity', store=True, )
-    rate = fields.Float(string='Rate', store=True, )
+    rate = fields.Float(string='Rate', compute='_compute_rate', store=True, readonly=False)
+    rate_analysis_id = fields.Many2one('rate.analysis', string='Rate Analysis', index=True)
     remarks = fields.Char(string='Remarks')
     is_used_rate_and_qty = fields.Boolean("Want to Use Rate and Qty?")
     display_type = fields.Selection([
@@ -160,21 +170,22 @@ class ProjectTask(models.Model):
     @api.depends('parent_id', 'parent_id.child_ids', 'parent_id.child_ids.sequence',
                  'parent_id.child_ids.display_type', 'display_type', 'sequence')
     def _compute_task_no(self):
-        for task in self:
-            if not task.parent_id:
-                task.task_no = ''
-                continue
-            if task.display_type in ('line_section', 'line_note'):
-                task.task_no = ''
+        # One sibling sort per parent, shared by every task of that parent
+        for parent, tasks in self.grouped('parent_id').items():
+            if not parent:
+                tasks.task_no = ''
                 continue
-            all_siblings = task.parent_id.child_ids.sorted(key=lambda r: r.sequence)
+            numbering = {}
             seq_number = 0
-            for sibling in all_siblings:
+            for sibling in parent.child_ids.sorted(key=lambda r: r.sequence):
                 if sibling.display_type not in ('line_section', 'line_note'):
                     seq_number += 1
-                if sibling.id == task.id:
-                    break
-            task.task_no = str(seq_number)
+                numbering[sibling.id] = seq_number
+            for task in tasks:
+                if task.display_type in ('line_section', 'line_note'):
+                    task.task_no = ''
+                else:
+                    task.task_no = str(numbering.get(task.id, seq_number))
 
 
     @api.depends('budget_amount')
@@ -187,6 +198,12 @@ class ProjectTask(models.Model):
                 record.word_of_budget_amount = False
 
 
+    @api.depends('rate_analysis_id.unit_rate', 'rate_analysis_id.uom_id', 'unit_id', 'is_used_rate_and_qty')
+    def _compute_rate(self):
+        # Only tasks priced from an analysis follow its rate, others keep the entered one
+        for task in self.filtered(lambda t: t.is_used_rate_and_qty and t.rate_analysis_id):
+            task.rate = task.rate_analysis_id._convert_unit_rate(task.unit_id)
+
     @api.onchange('calculation_type')
     def _onchange_calculation_type(self):
         for task in self:
@@ -195,92 +212,290 @@ class ProjectTask(models.Model):
 
     @api.depends('parent_id.child_ids.budget_amount', 'parent_id.child_ids.display_type')
     def _compute_section_subtotal(self):
+        self.section_subtotal = 0.0
+        sections = self.filtered(lambda t: t.display_type == 'line_section' and t.parent_id)
+        # One sibling sort per parent: each line adds to the section above it
+        for parent, parent_sections in sections.grouped('parent_id').items():
+            subtotals = {}
+            current_section = None
+            for sibling in parent.child_ids.sorted(key=lambda r: r.sequence):
+                if sibling.display_type == 'line_section':
+                    current_section = sibling.id
+                    subtotals[current_section] = 0.0
+                elif not sibling.display_type and current_section is not None:
+                    subtotals[current_section] += sibling.budget_amount
+            for section in parent_sections:
+                section.section_subtotal = subtotals.get(section.id, 0.0)
+
+    def _get_budget_references(self):
+        """Tasks whose budget amount feeds the budget amount of ``self``"""
+        references = self.browse()
         for task in self:
-            if task.display_type == 'line_section' and task.parent_id:
-                all_siblings = task.parent_id.child_ids.sorted(key=lambda r: r.sequence)
-                current_index = 0
-                for idx, sibling in enumerate(all_siblings):
-                    if sibling.id == task.id:
-                        current_index = idx
-                        break
-                subtotal = 0.0
-                for idx in range(current_index + 1, len(all_siblings)):
-                    sibling = all_siblings[idx]
-                    if sibling.display_type == 'line_section':
-                        break
-                    if not sibling.display_type:
-                        subtotal += sibling.budget_amount
-                task.section_subtotal = subtotal
-            else:
-                task.section_subtotal = 0.0
-
-    @api.depends('quantity', 'rate', 'is_used_rate_and_qty', 'child_ids.budget_amount',
-                 'calculation_type', 'percentage_value', 'reference_task_id.budget_amount')
-    def _compute_amount(self):
+            if task.display_type or task.is_used_rate_and_qty:
+                continue
+            if task.calculation_type == 'sum_children':
+                references |= task.reference_task_ids
+            elif task.calculation_type == 'add_percentage':
+                references |= task.reference_task_id
+        return references
+
+    def _get_budget_evaluation_order(self):
+        """Order ``self`` so that referenced tasks are evaluated before the
+        tasks that reference them (Kahn's algorithm), raising on cycles.
+        """
+        pending = {task.id: task._get_budget_references() & self for task in self}
+        dependents = {task.id: [] for task in self}
         for task in self:
+            for reference in pending[task.id]:
+                dependents[reference.id].append(task)
+        in_degree = {task_id: len(references) for task_id, references in pending.items()}
+        ready = [task for task in self if not in_degree[task.id]]
+        ordered = []
+        while ready:
+            task = ready.pop()
+            ordered.append(task)
+            for dependent in dependents[task.id]:
+                in_degree[dependent.id] -= 1
+                if not in_degree[dependent.id]:
+                    ready.append(dependent)
+        if len(ordered) != len(self):
+            raise ValidationError(_("Budget calculation references form a cycle between tasks: %s",
+                                    ', '.join(self.filtered(lambda t: in_degree[t.id]).mapped('display_name'))))
+        return ordered
+
+    @api.constrains('calculation_type', 'reference_task_id', 'reference_task_ids')
+    def _check_budget_reference_cycle(self):
+        for task in self:
+            seen = self.browse()
+            references = task._get_budget_references()
+            while references:
+                if task in references:
+                    raise ValidationError(_("Task '%s' cannot reference itself, directly or through other tasks, "
+                                            "in its budget calculation.", task.display_name))
+                seen |= references
+                references = references._get_budget_references() - seen
+
+    @api.depends('quantity', 'rate', 'is_used_rate_and_qty', 'display_type',
+                 'calculation_type', 'percentage_value',
+                 'reference_task_id.budget_amount', 'reference_task_ids.budget_amount')
+    def _compute_amount(self):
+        # Referenced tasks first, so one pass sees up to date amounts; the ORM
+        # only marks the tasks that depend on a changed leaf for recompute.
+        for task in self._get_budget_evaluation_order():
             if task.display_type:
                 task.budget_amount = 0.0
-                continue
-            if task.is_used_rate_and_qty:
+            elif task.is_used_rate_and_qty:
                 task.budget_amount = task.quantity * task.rate
             elif task.calculation_type == 'sum_children':
-                for subtask in self.reference_task_ids:
-                    task.budget_amount += subtask.budget_amount
+                task.budget_amount = sum(task.reference_task_ids.mapped('budget_amount'))
             elif task.calculation_type == 'add_percentage':
                 if task.reference_task_id:
                     base_amount = task.reference_task_id.budget_amount
                     task.budget_amount = base_amount + (base_amount * task.percentage_value / 100.0)
 
+    def _get_budget_subtree_accounts(self):
+        """Return {analytic account id: task id} for every budget task in the
+        subtrees of ``self`` (the tasks themselves included), read from
+        ``parent_path`` in one query.
+        """
+        if not self.ids:
+            return {}
+        self.env['project.task'].flush_model(['parent_path', 'is_create_budget', 'analytic_account_id'])
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (t.analytic_account_id) t.analytic_account_id, t.id
+              FROM project_task root
+              JOIN project_task t ON t.parent_path LIKE root.parent_path || '%%'
+             WHERE root.id = ANY(%s)
+               AND t.is_create_budget
+               AND t.analytic_account_id IS NOT NULL
+          ORDER BY t.analytic_account_id, t.id
+        """, (self.ids,))
+        return dict(self.env.cr.fetchall())
+
     @api.onchange('planned_date_begin', 'date_deadline')
     def get_task_date(self):
         self.date_from = self.planned_date_begin and self.planned_date_begin.date() or False
         self.date_to = self.date_deadline and self.date_deadline.date() or False
 
-    def create_analytic_budget(self, task_id):
-        if task_id and task_id.budget_amount:
-            account_id = False
-            budget_analytic_id = False
-            existing_analytic_account = self.env['account.analytic.account'].search([
-                ('name', '=', task_id.sequence_code)
-            ])
-            if not existing_analytic_account:
-                account_id = self.env['account.analytic.account'].create({
-                    'name': task_id.sequence_code,
-                    'code': task_id.name,
-                    'partner_id': task_id.partner_id.id,
-                    'company_id': self.env.company.id,
-                    'plan_id': self.env.ref('analytic.analytic_plan_projects').id
-                })
+    @api.model
+    def _get_budget_account_ancestors(self):
+        """Return {analytic account id (str): tuple of ancestor budget account
+        ids (str)} for every budgeted task, derived from ``parent_path``.
+
+        The result is cached in the registry and must not be mutated. Once
+        the hierarchy changed in the current transaction, it is rebuilt at
+        most once per change on the cursor instead, and the registry cache
+        is cleared a single time when the transaction commits.
+        """
+        stale = self.env.cr.cache.get(BUDGET_ANCESTORS_KEY)
+        if stale is None:
+            return self._get_cached_budget_account_ancestors()
+        if 'ancestors' not in stale:
+            stale['ancestors'] = self._read_budget_account_ancestors()
+        return stale['ancestors']
+
+    @api.model
+    @tools.ormcache()
+    def _get_cached_budget_account_ancestors(self):
+        return self._read_budget_account_ancestors()
+
+    @api.model
+    def _read_budget_account_ancestors(self):
+        self.flush_model(['parent_path', 'is_create_budget', 'analytic_account_id'])
+        self.env.cr.execute("""
+            SELECT id, parent_path, analytic_account_id
+              FROM project_task
+             WHERE is_create_budget AND analytic_account_id IS NOT NULL
+          ORDER BY id
+        """)
+        rows = self.env.cr.fetchall()
+        account_per_task = {task_id: str(account_id) for task_id, dummy, account_id in rows}
+        ancestors = {}
+        for task_id, parent_path, account_id in rows:
+            parent_ids = [int(pid) for pid in (parent_path or '').split('/')[:-2] if pid]
+            # Nearest ancestor first, as walked up through parent_id
+            ancestors.setdefault(str(account_id), tuple(
+                account_per_task[parent_id] for parent_id in reversed(parent_ids)
+                if parent_id in account_per_task
+            ))
+        return ancestors
+
+    @api.model
+    def _get_project_budget_account_ids(self, projects):
+        """Return {project id: frozenset of budget task account ids} for
+        ``projects``, or None for a project without any budget task.
+
+        Memoized on the cursor for the current transaction so that all lines
+        of an order, and all orders of a batch, share one grouped query.
+        """
+        cr = self.env.cr
+        if PROJECT_BUDGET_ACCOUNTS_KEY not in cr.cache:
+            cr.postcommit.add(lambda: cr.cache.pop(PROJECT_BUDGET_ACCOUNTS_KEY, None))
+            cr.postrollback.add(lambda: cr.cache.pop(PROJECT_BUDGET_ACCOUNTS_KEY, None))
+        memo = cr.cache.setdefault(PROJECT_BUDGET_ACCOUNTS_KEY, {})
+        missing = [project_id for project_id in projects.ids if project_id not in memo]
+        if missing:
+            memo.update(dict.fromkeys(missing))
+            for project, account_ids in self.env['project.task'].sudo()._read_group(
+                    [('project_id', 'in', missing), ('is_create_budget', '=', True)],
+                    ['project_id'], ['analytic_account_id:array_agg']):
+                memo[project.id] = frozenset(account_id for account_id in account_ids if account_id)
+        return {project_id: memo[project_id] for project_id in projects.ids}
+
+    def _invalidate_budget_account_ancestors(self):
+        cr = self.env.cr
+        if BUDGET_ANCESTORS_KEY not in cr.cache:
+            cr.precommit.add(self.env.registry.clear_cache)
+            cr.postcommit.add(lambda: cr.cache.pop(BUDGET_ANCESTORS_KEY, None))
+            cr.postrollback.add(lambda: cr.cache.pop(BUDGET_ANCESTORS_KEY, None))
+        cr.cache[BUDGET_ANCESTORS_KEY] = {}
+
+    def _invalidate_budget_account_caches(self):
+        self._invalidate_budget_account_ancestors()
+        self.env.cr.cache.pop(PROJECT_BUDGET_ACCOUNTS_KEY, None)
+
+    def _get_budget_hierarchy_key(self):
+        self.ensure_one()
+        return (
+            self.parent_id.id,
+            bool(self.is_create_budget and self.analytic_account_id),
+            self.analytic_account_id.id,
+        )
 
-            existing_budget_analytic_id = self.env['budget.analytic'].search([
-                ('name', '=', task_id.sequence_code + ' : ' + task_id.name)
-            ])
-            if not existing_budget_analytic_id:
-                budget_analytic_id = self.env['budget.analytic'].create({
-                    'name': task_id.sequence_code + ' : ' + task_id.name,
-                    'user_id': self.env.user.id,
-                    'budget_type': task_id.budget_type,
-                    'date_from': task_id.date_from,
-                    'date_to': task_id.date_to,
-                    'parent_id': False,
-                    'company_id': self.env.company.id,
-                })
-                budget_analytic_id.action_budget_confirm()
-                self.env['budget.line'].create({
-                    'budget_analytic_id': budget_analytic_id and budget_analytic_id.id or False,
-                    'account_id': account_id and account_id.id or False,
-                    'budget_amount': task_id.budget_amount,
-                })
+    def create_analytic_budget(self, task_id):
+        task_id._provision_analytic_budgets()
+
+    def _provision_analytic_budgets(self):
+        """Create the analytic account, budget and budget line of every task
+        in ``self`` that does not have them yet, in batch.
+
+        Existing accounts and budgets are resolved with one search_read each,
+        keyed by the task ``sequence_code``; all missing records are created
+        with one create per model and the budgets confirmed together.
+        """
+        tasks = self.filtered('budget_amount')
+        if not tasks:
+            return
+        company = self.env.company
+        budget_names = {task.id: task.sequence_code + ' : ' + task.name for task in tasks}
+        existing_accounts = {
+            account['name']: account['id']
+            for account in self.env['account.analytic.account'].search_read(
+                [('name', 'in', tasks.mapped('sequence_code'))], ['name'])
+        }
+        existing_budgets = {
+            budget['name']
+            for budget in self.env['budget.analytic'].search_read(
+                [('name', 'in', list(budget_names.values()))], ['name'])
+        }
 
-            if account_id and budget_analytic_id:
-                task_id.write({
-                    'analytic_account_id': account_id.id,
-                    'budget_analytic_id': budget_analytic_id.id,
-                    'company_id': self.env.company.id,
-                })
-                task_id.project_id.write({
-                    'company_id': self.env.company.id,
+        new_accounts = {}
+        account_vals = []
+        for task in tasks:
+            if task.sequence_code in existing_accounts or task.sequence_code in new_accounts:
+                continue
+            new_accounts[task.sequence_code] = len(account_vals)
+            account_vals.append({
+                'name': task.sequence_code,
+                'code': task.name,
+                'partner_id': task.partner_id.id,
+                'company_id': company.id,
+                'plan_id': self.env.ref('analytic.analytic_plan_projects').id
+            })
+        accounts = self.env['account.analytic.account'].create(account_vals)
+        new_accounts = {code: accounts[index].id for code, index in new_accounts.items()}
+
+        budget_tasks = tasks.filtered(lambda t: budget_names[t.id] not in existing_budgets)
+        budgets = self.env['budget.analytic'].create([{
+            'name': budget_names[task.id],
+            'user_id': self.env.user.id,
+            'budget_type': task.budget_type,
+            'date_from': task.date_from,
+            'date_to': task.date_to,
+            'parent_id': False,
+            'company_id': company.id,
+        } for task in budget_tasks])
+        budgets.action_budget_confirm()
+        self.env['budget.line'].create([{
+            'budget_analytic_id': budget.id,
+            'account_id': new_accounts.get(task.sequence_code, False),
+            'budget_amount': task.budget_amount,
+        } for task, budget in zip(budget_tasks, budgets)])
+
+        # Linked through the base write: the override would otherwise rerun
+        # provisioning and the cache invalidation once per task
+        linked = self.browse()
+        for task, budget in zip(budget_tasks, budgets):
+            if task.sequence_code in new_accounts:
+                super(ProjectTask, task).write({
+                    'analytic_account_id': new_accounts[task.sequence_code],
+                    'budget_analytic_id': budget.id,
+                    'company_id': company.id,
                 })
+                linked |= task
+        if linked:
+            self._invalidate_budget_account_caches()
+        budget_tasks.project_id.write({
+            'company_id': company.id,
+        })
+
+    def _check_project_budget_totals(self):
+        """Validate once per project, against the project budget ledger, that
+        the tasks fit in the project budget.
+        """
+        projects = self.project_id.filtered('project_budget_line_id')
+        for project in projects:
+            if project.task_budget_allocated > project.project_budget_limit:
+                raise ValidationError(_("Task Budget Amount is greater than overall Project Budget!!"))
+
+    def _get_tasks_to_provision(self):
+        return self.filtered(
+            lambda task: task.calculation_type == 'manual'
+            and task.is_create_budget
+            and task.budget_amount > 0
+            and task.project_id.project_budget_line_id
+            and (not task.parent_id or task.parent_id.is_create_budget)
+        )
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -290,67 +505,55 @@ class ProjectTask(models.Model):
             if vals.get('sequence_code', 'New') == 'New' and vals.get('parent_id'):
                 vals['sequence_code'] = self.env['ir.sequence'].next_by_code('sequence.sub.task.code') or _('New')
         tasks = super(ProjectTask, self).create(vals_list)
-
-        for task in tasks:
-            if task.calculation_type != 'manual':
-                continue
-
-            project_budget_id = self.env['budget.line'].search([('account_id', '=', task.project_id.account_id.id)],
-                                                               limit=1)
-            # if not project_budget_id:
-            #     raise ValidationError(_("Please first configure budget for your project!!"))
-
-            if task.is_create_budget and not task.parent_id and task.budget_amount and \
-                    task.budget_amount > 0 and project_budget_id:
-                all_project_task_amount = task.project_id and sum(
-                    task.project_id.task_ids.mapped('budget_amount')) or 0.0
-                if project_budget_id and all_project_task_amount > project_budget_id.budget_amount:
-                    raise ValidationError(_("Task Budget Amount is greater than overall Project Budget!!"))
-                task.create_analytic_budget(task)
-
-            if task.is_create_budget and task.parent_id and task.parent_id.is_create_budget \
-                    and task.budget_amount and task.budget_amount > 0 and project_budget_id:
-                all_sub_task_amount = task.parent_id.child_ids and sum(
-                    task.parent_id.child_ids.mapped('budget_amount')) or 0.0
-                # if all_sub_task_amount > task.parent_id.budget_amount:
-                #     raise ValidationError(_("Sub Task Budget Amount cannot exceed its Parent Task Amount!!"))
-                task.create_analytic_budget(task)
+        # A new task only enters the hierarchy once it has an account,
+        # otherwise provisioning below links it and invalidates
+        if any(task.is_create_budget and task.analytic_account_id for task in tasks):
+            self._invalidate_budget_account_caches()
+
+        # One ledger check and one provisioning pass for the whole batch
+        to_provision = tasks._get_tasks_to_provision()
+        to_provision.filtered(lambda t: not t.parent_id)._check_project_budget_totals()
+        to_provision._provision_analytic_budgets()
         return tasks
 
     def write(self, vals):
+        hierarchy_written = BUDGET_HIERARCHY_FIELDS.intersection(vals)
+        if hierarchy_written:
+            hierarchy_before = {task.id: task._get_budget_hierarchy_key() for task in self}
         tasks = super(ProjectTask, self).write(vals)
+        if hierarchy_written:
+            changed = self.filtered(lambda t: hierarchy_before[t.id] != t._get_budget_hierarchy_key())
+            # The ancestry only moves if a changed task was budgeted, or
+            # now is or carries budget tasks below it
+            if changed and (
+                any(hierarchy_before[task.id][1] for task in changed)
+                or changed._get_budget_subtree_accounts()
+            ):
+                self._invalidate_budget_account_ancestors()
+        if PROJECT_BUDGET_FIELDS.intersection(vals):
+            self.env.cr.cache.pop(PROJECT_BUDGET_ACCOUNTS_KEY, None)
         if 'budget_amount' in vals:
-            for task in self:
-                if task.budget_analytic_id and task.analytic_account_id:
-                    budget_line = self.env['budget.line'].search([
-                        ('budget_analytic_id', '=', task.budget_analytic_id.id),
-                        ('account_id', '=', task.analytic_account_id.id)
-                    ], limit=1)
-                    if budget_line:
-                        budget_line.write({
-                            'budget_amount': vals['budget_amount']
-                        })
-        for task in self:
-            if task.calculation_type != 'manual':
-                continue
+            budgeted = self.filtered(lambda t: t.budget_analytic_id and t.analytic_account_id)
+            budget_lines = self.env['budget.line'].search([
+                ('budget_analytic_id', 'in', budgeted.budget_analytic_id.ids),
+                ('account_id', 'in', budgeted.analytic_account_id.ids),
+            ])
+            keys = {(t.budget_analytic_id.id, t.analytic_account_id.id) for t in budgeted}
+            budget_lines.filtered(
+                lambda l: (l.budget_analytic_id.id, l.account_id.id) in keys
+            ).write({
+                'budget_amount': vals['budget_amount']
+            })
+
+        self._get_tasks_to_provision().filtered(
+            lambda t: not t.analytic_account_id and not t.budget_analytic_id
+        )._provision_analytic_budgets()
+        return tasks
 
-            project_budget_id = self.env['budget.line'].search([('account_id', '=', task.project_id.account_id.id)],
-                                                               limit=1)
-            if task.is_create_budget and not task.parent_id and task.budget_amount and \
-                    task.budget_amount > 0 and project_budget_id:
-                all_project_task_amount = task.project_id and sum(
-                    task.project_id.task_ids.mapped('budget_amount')) or 0.0
-                # if project_budget_id and all_project_task_amount > project_budget_id.budget_amount:
-                #     raise ValidationError(_("Task Budget Amount is greater than overall Project Budget!!"))
-                if not task.analytic_account_id and not task.budget_analytic_id:
-                    task.create_analytic_budget(task)
-
-            if task.is_create_budget and task.parent_id and task.parent_id.is_create_budget \
-                    and task.budget_amount and task.budget_amount > 0 and project_budget_id:
-                all_sub_task_amount = task.parent_id.child_ids and sum(
-                    task.parent_id.child_ids.mapped('budget_amount')) or 0.0
-                # if all_sub_task_amount > task.parent_id.budget_amount:
-                #     raise ValidationError(_("Sub Task Budget Amount cannot exceed its Parent Task Amount!!"))
-                if not task.analytic_account_id and not task.budget_analytic_id:
-                    task.create_analytic_budget(task)
-        return tasks
\ No newline at end of file
+    def unlink(self):
+        # Deleting tasks only reshapes the hierarchy if their subtrees hold a budget task
+        budgeted = bool(self._get_budget_subtree_accounts())
+        res = super().unlink()
+        if budgeted:
+            self._invalidate_budget_account_caches()
+        return res
@@ -1,6 +1,9 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 
+# Order fields feeding the materialized committed costs (budget.committed.cost)
+COMMITTED_COST_ORDER_FIELDS = {'state', 'date_order', 'currency_rate', 'company_id', 'user_id'}
+
 
 class PurchaseOrder(models.Model):
     _inherit = "purchase.order"
@@ -8,6 +11,12 @@ class PurchaseOrder(models.Model):
     prepared_by_name = fields.Char(string="Prepared By")
     approved_by_name = fields.Char(string="Approved By")
 
+    def write(self, vals):
+        res = super(PurchaseOrder, self).write(vals)
+        if COMMITTED_COST_ORDER_FIELDS.intersection(vals):
+            self.env['budget.committed.cost'].sudo()._refresh(self.order_line)
+        return res
+
     def button_confirm(self):
         for order in self:
             for line in order.order_line:
@@ -17,28 +26,17 @@ class PurchaseOrder(models.Model):
                     raise ValidationError(
                         _("You have configured analytic distribution so please add related project for this Purchase Order!!"))
         res = super(PurchaseOrder, self).button_confirm()
+        ancestors = self.env['project.task']._get_budget_account_ancestors()
         for order in self:
+            project_distribution = order.project_id._get_analytic_distribution()
+            project_distribution = {str(k): v for k, v in project_distribution.items()}
             for line in order.order_line:
                 distribution = line.analytic_distribution or {}
                 distribution = {str(k): v for k, v in distribution.items()}
-                project_distribution = order.project_id._get_analytic_distribution()
-                project_distribution = {str(k): v for k, v in project_distribution.items()}
                 distribution.update(project_distribution)
                 for analytic_id_str, percentage in list(distribution.items()):
-                    analytic_id = int(analytic_id_str)
-                    task = self.env['project.task'].search([
-                        ('analytic_account_id', '=', analytic_id),
-                        ('is_create_budget', '=', True)
-                    ], limit=1)
-                    if task:
-                        parent_task = task.parent_id
-                        while parent_task:
-                            if parent_task.is_create_budget and parent_task.analytic_account_id:
-                                parent_analytic_id = str(parent_task.analytic_account_id.id)
-                                if parent_analytic_id not in distribution:
-                                    distribution[parent_analytic_id] = percentage
-                                else:
-                                    distribution[parent_analytic_id] += percentage
-                            parent_task = parent_task.parent_id
-                line.analytic_distribution = distribution
-        return res
\ No newline at end of file
+                    for parent_analytic_id in ancestors.get(analytic_id_str, ()):
+                        distribution[parent_analytic_id] = distribution.get(parent_analytic_id, 0) + percentage
+                line.with_context(skip_committed_cost_refresh=True).analytic_distribution = distribution
+        self.env['budget.committed.cost'].sudo()._refresh(self.order_line)
+        return res
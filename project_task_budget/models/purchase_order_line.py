@@ -1,39 +1,48 @@
 from odoo import api, models
 
+# Line fields feeding the materialized committed costs (budget.committed.cost)
+COMMITTED_COST_LINE_FIELDS = {
+    'analytic_distribution', 'product_qty', 'price_unit', 'discount', 'tax_ids', 'product_uom_id', 'name',
+}
+
 
 class PurchaseOrderLine(models.Model):
     _inherit = 'purchase.order.line'
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        confirmed = lines.filtered(lambda l: l.order_id.state in ('purchase', 'done'))
+        if confirmed:
+            self.env['budget.committed.cost'].sudo()._refresh(confirmed)
+        return lines
+
+    def write(self, vals):
+        res = super().write(vals)
+        if COMMITTED_COST_LINE_FIELDS.intersection(vals) and not self.env.context.get('skip_committed_cost_refresh'):
+            self.env['budget.committed.cost'].sudo()._refresh(self)
+        return res
+
     @api.depends('product_id', 'order_id.partner_id', 'order_id.project_id')
     def _compute_analytic_distribution(self):
         super()._compute_analytic_distribution()
         ProjectProject = self.env['project.project']
+        context_project = ProjectProject.browse(self.env.context.get('project_id'))
+        budget_accounts = self.env['project.task']._get_project_budget_account_ids(
+            context_project or self.order_id.project_id
+        )
         for line in self:
-            project_id = line.env.context.get('project_id')
-            project = ProjectProject.browse(project_id) if project_id else line.order_id.project_id
+            project = context_project or line.order_id.project_id
             if line.display_type or not project:
                 continue
             if line.analytic_distribution:
-                if any(task.is_create_budget for task in project.task_ids):
-                    account_ids = []
-                    for task in project.task_ids:
-                        if task.is_create_budget:
-                            if task.analytic_account_id:
-                                account_ids.append(task.analytic_account_id.id)
-
-                            child_account_ids = task.child_ids.filtered(lambda l: l.is_create_budget).mapped(
-                                'analytic_account_id.id')
-                            account_ids.extend(child_account_ids)
-                            account_ids = list(set(account_ids))
-                    account_id = account_ids and min(account_ids) or []
-                    if account_id:
-                        task_analytic = self.env['account.analytic.account'].browse(account_id)
-                        if task_analytic:
-                            percentage = next(iter(line.analytic_distribution.values()))
-
-                            line.analytic_distribution = {
-                                str(task_analytic.id): percentage
-                            }
+                account_ids = budget_accounts.get(project.id)
+                if account_ids is not None:
+                    if account_ids:
+                        percentage = next(iter(line.analytic_distribution.values()))
+                        line.analytic_distribution = {
+                            str(min(account_ids)): percentage
+                        }
                 else:
                     applied_root_plans = self.env['account.analytic.account'].browse(
                     list({int(account_id) for ids in line.analytic_distribution for account_id in ids.split(",")})
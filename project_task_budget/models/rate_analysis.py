@@ -1,4 +1,5 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, _
+from odoo.exceptions import ValidationError
 
 
 class RateAnalysis(models.Model):
@@ -8,12 +9,50 @@ class RateAnalysis(models.Model):
 
     analysis_code = fields.Char(string="Analysis Code", required=True)
     material_name = fields.Char(string="Material Name", required=True)
-    project_id = fields.Many2one('project.project', string='Project')
+    project_id = fields.Many2one('project.project', string='Project', index=True)
     rate_analysis_line_ids = fields.One2many(
         'rate.analysis.line',
         'analysis_id',
         string="Rate Breakup Lines"
     )
+    uom_id = fields.Many2one('uom.uom', string='Unit')
+    output_quantity = fields.Float(
+        string="Output Quantity",
+        default=1.0,
+        help="Quantity of the analysed item, in its unit, produced by the rate breakup."
+    )
+    # Sub-analyses feed their unit rate into the lines of other analyses, so
+    # these fields depend on themselves through rate.analysis.line
+    total_amount = fields.Float(
+        string="Total Amount",
+        compute="_compute_total_amount",
+        store=True,
+        recursive=True
+    )
+    unit_rate = fields.Float(
+        string="Unit Rate",
+        compute="_compute_unit_rate",
+        store=True,
+        recursive=True
+    )
+    task_ids = fields.One2many('project.task', 'rate_analysis_id', string="Tasks")
+
+    @api.depends('rate_analysis_line_ids.amount')
+    def _compute_total_amount(self):
+        for analysis in self:
+            analysis.total_amount = sum(analysis.rate_analysis_line_ids.mapped('amount'))
+
+    @api.depends('total_amount', 'output_quantity')
+    def _compute_unit_rate(self):
+        for analysis in self:
+            analysis.unit_rate = analysis.total_amount / (analysis.output_quantity or 1.0)
+
+    def _convert_unit_rate(self, to_unit):
+        """Unit rate of the analysis expressed per ``to_unit``"""
+        self.ensure_one()
+        if self.uom_id and to_unit and self.uom_id != to_unit:
+            return self.uom_id._compute_price(self.unit_rate, to_unit)
+        return self.unit_rate
 
 
 class RateAnalysisLine(models.Model):
@@ -24,18 +63,39 @@ class RateAnalysisLine(models.Model):
         'rate.analysis',
         string="Rate Analysis",
         ondelete='cascade',
-        required=True
+        required=True,
+        index=True
+    )
+    sub_analysis_id = fields.Many2one(
+        'rate.analysis',
+        string="Sub Analysis",
+        ondelete='restrict',
+        index=True,
+        help="Reuse the unit rate of another analysis, e.g. a concrete mix inside a slab rate."
     )
     description = fields.Char(string="Description", required=True)
     quantity = fields.Float(string="Quantity", default=1.0)
-    rate = fields.Float(string="Rate")
+    rate = fields.Float(
+        string="Rate",
+        compute="_compute_rate",
+        store=True,
+        readonly=False,
+        recursive=True
+    )
     unit = fields.Many2one('uom.uom', string='Unit')
     amount = fields.Float(
         string="Amount",
         compute="_compute_amount",
-        store=True
+        store=True,
+        recursive=True
     )
 
+    @api.depends('sub_analysis_id.unit_rate', 'sub_analysis_id.uom_id', 'unit')
+    def _compute_rate(self):
+        # Lines without a sub analysis keep their manually entered base rate
+        for line in self.filtered('sub_analysis_id'):
+            line.rate = line.sub_analysis_id._convert_unit_rate(line.unit)
+
     @api.depends('quantity', 'rate')
     def _compute_amount(self):
         for line in self:
@@ -43,3 +103,21 @@ class RateAnalysisLine(models.Model):
                 line.amount = line.quantity * line.rate
             else:
                 line.amount = line.rate
+
+    @api.onchange('sub_analysis_id')
+    def _onchange_sub_analysis_id(self):
+        for line in self.filtered('sub_analysis_id'):
+            line.description = line.description or line.sub_analysis_id.material_name
+            line.unit = line.unit or line.sub_analysis_id.uom_id
+
+    @api.constrains('sub_analysis_id')
+    def _check_sub_analysis_cycle(self):
+        for analysis in self.analysis_id:
+            seen = analysis.browse()
+            children = analysis.rate_analysis_line_ids.sub_analysis_id
+            while children:
+                if analysis in children:
+                    raise ValidationError(_("Rate analysis '%s' cannot use itself, directly or through other "
+                                            "analyses, as a sub analysis.", analysis.display_name))
+                seen |= children
+                children = children.rate_analysis_line_ids.sub_analysis_id - seen
@@ -0,0 +1,86 @@
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+
+class BudgetCommittedCost(models.Model):
+    _name = 'budget.committed.cost'
+    _description = 'Budget Committed Cost'
+    _log_access = False
+
+    purchase_line_id = fields.Many2one('purchase.order.line', string='Purchase Line', required=True,
+                                       ondelete='cascade', index=True, readonly=True)
+    order_id = fields.Many2one('purchase.order', string='Purchase Order', ondelete='cascade', readonly=True)
+    account_id = fields.Many2one('account.analytic.account', string='Analytic Account', ondelete='cascade',
+                                 readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True)
+    user_id = fields.Many2one('res.users', string='Buyer', readonly=True)
+    date = fields.Date(string='Order Date', readonly=True)
+    description = fields.Text(string='Description', readonly=True)
+    amount = fields.Float(string='Committed', readonly=True)
+
+    _account_date_idx = models.Index('(account_id, date)')
+
+    @api.model
+    def _refresh(self, purchase_lines=None):
+        """Recompute the committed cost rows of ``purchase_lines`` (all lines
+        when None): the not yet invoiced part of each confirmed line, split
+        per analytic account of its distribution, in company currency.
+        """
+        self.env['purchase.order.line'].flush_model()
+        self.env['purchase.order'].flush_model()
+        self.env['account.move.line'].flush_model()
+        self.env['account.move'].flush_model(['move_type', 'state'])
+        if purchase_lines is None:
+            self.env.cr.execute("DELETE FROM budget_committed_cost")
+            line_filter = SQL("TRUE")
+        else:
+            line_ids = purchase_lines.ids
+            if not line_ids:
+                return
+            self.env.cr.execute(
+                "DELETE FROM budget_committed_cost WHERE purchase_line_id = ANY(%s)", (line_ids,))
+            line_filter = SQL("pol.id = ANY(%s)", line_ids)
+
+        self.env.cr.execute(SQL("""
+            WITH qty_invoiced AS (
+                SELECT aml.purchase_line_id AS pol_id,
+                       SUM(
+                           CASE WHEN COALESCE(uom_aml.id != uom_pol.id, FALSE)
+                                THEN (aml.quantity / uom_aml.factor) * uom_pol.factor
+                                ELSE COALESCE(aml.quantity, 0)
+                           END
+                           * CASE WHEN am.move_type = 'in_invoice' THEN 1
+                                  WHEN am.move_type = 'in_refund' THEN -1
+                                  ELSE 0 END
+                       ) AS qty
+                  FROM account_move_line aml
+                  JOIN purchase_order_line pol ON pol.id = aml.purchase_line_id
+                  JOIN account_move am ON am.id = aml.move_id
+             LEFT JOIN uom_uom uom_aml ON uom_aml.id = aml.product_uom_id
+             LEFT JOIN uom_uom uom_pol ON uom_pol.id = pol.product_uom_id
+                 WHERE aml.parent_state = 'posted'
+                   AND %(line_filter)s
+              GROUP BY aml.purchase_line_id
+            )
+            INSERT INTO budget_committed_cost
+                   (purchase_line_id, order_id, account_id, company_id, user_id, date, description, amount)
+            SELECT pol.id,
+                   po.id,
+                   aaa.id,
+                   po.company_id,
+                   po.user_id,
+                   po.date_order::DATE,
+                   pol.name,
+                   COALESCE(pol.price_subtotal::FLOAT, pol.price_unit * pol.product_qty)
+                       / COALESCE(NULLIF(pol.product_qty, 0), 1)
+                       * GREATEST(pol.product_qty - COALESCE(q.qty, 0), 0)
+                       / po.currency_rate
+                       * (a.value::FLOAT / 100)
+              FROM purchase_order_line pol
+              JOIN purchase_order po ON po.id = pol.order_id AND po.state IN ('purchase', 'done')
+        CROSS JOIN LATERAL jsonb_each(pol.analytic_distribution) AS a(key, value)
+              JOIN account_analytic_account aaa
+                ON aaa.id = CASE WHEN a.key ~ '^[0-9]+$' THEN a.key::INT END
+         LEFT JOIN qty_invoiced q ON q.pol_id = pol.id
+             WHERE %(line_filter)s
+        """, line_filter=line_filter))
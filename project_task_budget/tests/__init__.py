@@ -0,0 +1 @@
+from . import test_budget_entry_points
@@ -0,0 +1,61 @@
+from odoo import fields
+from odoo.tests import common, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestBudgetEntryPoints(common.TransactionCase):
+    """Smoke tests for the entry points that read budget task subtrees"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        today = fields.Date.today()
+        cls.project = cls.env['project.project'].create({
+            'name': 'Budget Project',
+            'is_create_budget': True,
+            'budget_amount': 100000.0,
+            'date_start': today,
+            'date': today,
+        })
+        task_vals = {
+            'project_id': cls.project.id,
+            'is_create_budget': True,
+            'budget_amount': 1000.0,
+            'date_from': today,
+            'date_to': today,
+        }
+        cls.task = cls.env['project.task'].create({**task_vals, 'name': 'Village'})
+        cls.subtask = cls.env['project.task'].create({**task_vals, 'name': 'Person', 'parent_id': cls.task.id})
+
+    def test_budget_subtree_accounts(self):
+        accounts = self.task._get_budget_subtree_accounts()
+        self.assertEqual(accounts, {
+            self.task.analytic_account_id.id: self.task.id,
+            self.subtask.analytic_account_id.id: self.subtask.id,
+        })
+        self.assertEqual(self.subtask._get_budget_subtree_accounts(),
+                         {self.subtask.analytic_account_id.id: self.subtask.id})
+
+    def test_project_budget_items(self):
+        budget_items = self.project._get_budget_items()
+        self.assertEqual(budget_items['total']['allocated'], 100000.0)
+        self.assertEqual(len(budget_items['data']), 3)
+
+    def test_project_profitability_items(self):
+        profitability_items = self.project._get_profitability_items(with_action=False)
+        self.assertIn('costs', profitability_items)
+
+    def _get_drill_down_line_ids(self, budget_line):
+        action = budget_line.action_open_budget_entries()
+        return next(set(leaf[2]) for leaf in action['domain'] if leaf[0] == 'budget_line_id')
+
+    def test_budget_line_drill_down(self):
+        BudgetLine = self.env['budget.line']
+        task_lines = BudgetLine.search([('account_id', 'in', (self.task | self.subtask).analytic_account_id.ids)])
+        self.assertEqual(len(task_lines), 2)
+        # The project line covers the project and every budget task below it
+        project_line = self.project.project_budget_line_id
+        self.assertEqual(self._get_drill_down_line_ids(project_line), set((project_line | task_lines).ids))
+        # A task line covers its own subtree only
+        task_line = task_lines.filtered(lambda l: l.account_id == self.task.analytic_account_id)
+        self.assertEqual(self._get_drill_down_line_ids(task_line), set(task_lines.ids))
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+{
+    'name': 'State Transition Log',
+    'version': '19.0.1.0.0',
+    'category': 'Hidden',
+    'summary': 'Append-only workflow state transition log with time-in-state durations',
+    'description': """
+State Transition Log
+====================
+
+Shared transition log used by purchase requisitions, material requests and
+daily progress reports.
+
+- One row per state change, inserted in batch when many records move together
+- Time spent in the previous state and total elapsed time stored on each row
+- Cycle-time analytics answered by a single grouped query
+    """,
+    'author': 'Nilamber',
+    'company': 'Nilamber',
+    'website': 'https://www.nilamber.com',
+    'depends': [
+        'mail',
+        'hr',
+    ],
+    'data': [
+        'security/ir.model.access.csv',
+        'views/state_transition_log_views.xml',
+    ],
+    'installable': True,
+    'application': False,
+    'license': 'LGPL-3',
+}
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+
+from . import state_transition_log
+from . import state_transition_mixin
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+
+
+class StateTransitionLog(models.Model):
+    _name = 'state.transition.log'
+    _description = 'State Transition Log'
+    _order = 'date desc, id desc'
+    _log_access = False
+
+    res_model = fields.Char(string='Document Model', required=True, readonly=True)
+    res_id = fields.Many2oneReference(string='Document ID', model_field='res_model', required=True, readonly=True)
+    from_state = fields.Char(string='From State', readonly=True)
+    to_state = fields.Char(string='To State', required=True, readonly=True)
+    state_label = fields.Char(string='State', compute='_compute_state_label')
+    date = fields.Datetime(string='Date', required=True, readonly=True, default=fields.Datetime.now)
+    user_id = fields.Many2one('res.users', string='User', readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True)
+    department_id = fields.Many2one('hr.department', string='Department', readonly=True)
+    duration_days = fields.Float(
+        string='Days in Previous State', readonly=True, aggregator='avg',
+        help='Time spent in the from state before this transition.',
+    )
+    elapsed_days = fields.Float(
+        string='Days Since Creation', readonly=True, aggregator='avg',
+        help='Time between the creation of the document and this transition.',
+    )
+    notes = fields.Text(string='Notes', readonly=True)
+
+    _res_date_idx = models.Index('(res_model, res_id, date DESC, id DESC)')
+    _model_state_date_idx = models.Index('(res_model, to_state, date)')
+
+    @api.depends('res_model', 'to_state')
+    def _compute_state_label(self):
+        labels_per_model = {}
+        for log in self:
+            if log.res_model not in labels_per_model:
+                field = log.res_model in self.env and self.env[log.res_model]._fields.get('state')
+                labels_per_model[log.res_model] = (dict(field._description_selection(self.env))
+                                                   if field and field.type == 'selection' else {})
+            log.state_label = labels_per_model[log.res_model].get(log.to_state, log.to_state)
+
+    @api.model
+    def _get_last_transition_dates(self, res_model, res_ids):
+        """Return {res_id: date of the latest transition} in one query"""
+        if not res_ids:
+            return {}
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (res_id) res_id, date
+              FROM state_transition_log
+             WHERE res_model = %s AND res_id = ANY(%s)
+          ORDER BY res_id, date DESC, id DESC
+        """, (res_model, list(res_ids)))
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _get_history(self, res_model, res_id, limit=None, before=None):
+        """Latest transitions of one document, newest first, optionally before a date"""
+        domain = [('res_model', '=', res_model), ('res_id', '=', res_id)]
+        if before:
+            domain.append(('date', '<', before))
+        return self.search(domain, limit=limit)
+
+    @api.model
+    def _get_cycle_time(self, res_model, to_state, groupby=('department_id',), domain=None):
+        """Average days from creation until a document reaches ``to_state``.
+
+        Answered by one grouped query over the log, e.g. the average days
+        from draft to ``po_confirm`` per department for requisitions.
+        """
+        domain = [('res_model', '=', res_model), ('to_state', '=', to_state)] + (domain or [])
+        return self._read_group(domain, list(groupby), ['elapsed_days:avg', '__count'])
+
+    @api.model
+    def _get_time_in_state(self, res_model, state, groupby=('department_id',), domain=None):
+        """Average days spent in ``state`` before leaving it"""
+        domain = [('res_model', '=', res_model), ('from_state', '=', state)] + (domain or [])
+        return self._read_group(domain, list(groupby), ['duration_days:avg', '__count'])
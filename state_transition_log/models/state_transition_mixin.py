@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+
+SECONDS_PER_DAY = 86400.0
+
+
+class StateTransitionMixin(models.AbstractModel):
+    _name = 'state.transition.mixin'
+    _description = 'State Transition Logging Mixin'
+
+    # Name of a hr.department many2one on the inheriting model, if any
+    _transition_department_field = None
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        # The initial state is logged too, so time in it is measured like any other state
+        if not self.env.context.get('skip_state_transition_log'):
+            created = records.filtered('state')
+            if created:
+                created._log_state_transitions({})
+        return records
+
+    def write(self, vals):
+        if 'state' not in vals or self.env.context.get('skip_state_transition_log'):
+            return super().write(vals)
+        old_states = {rec.id: rec.state for rec in self}
+        res = super().write(vals)
+        moved = self.filtered(lambda rec: old_states[rec.id] != rec.state)
+        if moved:
+            moved._log_state_transitions(old_states)
+        return res
+
+    def _log_state_transitions(self, old_states, notes=None):
+        """Append one log row per record, all inserted with a single create"""
+        Log = self.env['state.transition.log'].sudo()
+        last_dates = Log._get_last_transition_dates(self._name, self.ids)
+        now = fields.Datetime.now()
+        notes = notes or self.env.context.get('state_transition_note')
+        department_field = self._transition_department_field
+        vals_list = []
+        for rec in self:
+            created = rec.create_date or now
+            since = last_dates.get(rec.id) or created
+            vals_list.append({
+                'res_model': self._name,
+                'res_id': rec.id,
+                'from_state': old_states.get(rec.id),
+                'to_state': rec.state,
+                'date': now,
+                'user_id': self.env.uid,
+                'company_id': rec.company_id.id if 'company_id' in rec._fields else False,
+                'department_id': rec[department_field].id if department_field else False,
+                'duration_days': (now - since).total_seconds() / SECONDS_PER_DAY,
+                'elapsed_days': (now - created).total_seconds() / SECONDS_PER_DAY,
+                'notes': notes,
+            })
+        return Log.create(vals_list)
+
+    def _get_state_transition_history(self, limit=None, before=None):
+        self.ensure_one()
+        return self.env['state.transition.log'].sudo()._get_history(self._name, self.id, limit=limit, before=before)